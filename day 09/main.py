@@ -1,5 +1,5 @@
 # main.py
-from fastapi import FastAPI, Form, Request, UploadFile, File
+from fastapi import FastAPI, Form, Request, UploadFile, File, Query
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -12,6 +12,9 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import uuid
 import time
+from typing import List
+from starlette.concurrency import run_in_threadpool
+from transcription_jobs import JobStore, TranscriptionWorkers, ITEM_STATUSES
 
 # Load environment variables from .env
 load_dotenv()
@@ -47,6 +50,24 @@ templates = Jinja2Templates(directory="templates")
 UPLOADS_DIR = "uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
+# Batch transcription: uploaded files wait here until their item is transcribed.
+JOB_UPLOADS_DIR = os.path.join(UPLOADS_DIR, "jobs")
+os.makedirs(JOB_UPLOADS_DIR, exist_ok=True)
+MAX_JOB_ITEMS = 1000
+job_store = JobStore()
+transcription_workers = TranscriptionWorkers(job_store)
+
+
+@app.on_event("startup")
+async def start_transcription_workers():
+    await transcription_workers.start()
+
+
+@app.on_event("shutdown")
+async def stop_transcription_workers():
+    await transcription_workers.stop()
+    job_store.close()
+
 
 @app.get("/")
 async def home(request: Request):
@@ -189,6 +210,60 @@ async def transcribe_audio_file(audio_file: UploadFile = File(...)):
         await audio_file.close()
 
 
+@app.post("/transcribe/jobs")
+async def create_transcription_job(audio_files: List[UploadFile] = File(None), urls: List[str] = Form(None)):
+    if not ASSEMBLYAI_API_KEY:
+        return JSONResponse(status_code=500, content={"error": "AssemblyAI API key not configured."})
+    audio_files = audio_files or []
+    urls = [url.strip() for url in (urls or []) if url.strip()]
+    if not audio_files and not urls:
+        return JSONResponse(status_code=400, content={"error": "No `audio_files` or `urls` provided."})
+    if len(audio_files) + len(urls) > MAX_JOB_ITEMS:
+        return JSONResponse(status_code=400, content={"error": f"A job can hold at most {MAX_JOB_ITEMS} items."})
+    bad_urls = [url for url in urls if not url.startswith(("http://", "https://"))]
+    if bad_urls:
+        return JSONResponse(status_code=400, content={"error": "Only http(s) URLs can be transcribed.", "details": bad_urls})
+
+    sources = [{"kind": "url", "source": url, "name": url} for url in urls]
+    try:
+        for audio_file in audio_files:
+            save_path = os.path.join(JOB_UPLOADS_DIR, f"{uuid.uuid4().hex}_{os.path.basename(audio_file.filename or 'audio')}")
+            with open(save_path, "wb") as out_f:
+                await run_in_threadpool(shutil.copyfileobj, audio_file.file, out_f)
+            sources.append({"kind": "file", "source": save_path, "name": audio_file.filename})
+    except Exception as e:
+        for item in sources:
+            if item["kind"] == "file":
+                os.remove(item["source"])
+        return JSONResponse(status_code=500, content={"error": "Could not store the uploaded files.", "details": str(e)})
+    finally:
+        for audio_file in audio_files:
+            await audio_file.close()
+
+    job_id = await job_store.create_job(sources)
+    transcription_workers.notify()
+    return JSONResponse(status_code=202, content=await job_store.job(job_id))
+
+
+@app.get("/transcribe/jobs/{job_id}")
+async def get_transcription_job(job_id: str):
+    job = await job_store.job(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    return JSONResponse(content=job)
+
+
+@app.get("/transcribe/jobs/{job_id}/items")
+async def get_transcription_job_items(job_id: str, status: str = Query(None), offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    if not await job_store.job(job_id):
+        return JSONResponse(status_code=404, content={"error": "Job not found."})
+    if status and status not in ITEM_STATUSES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown status. Use one of: {', '.join(ITEM_STATUSES)}."})
+    items, total = await job_store.items(job_id, status=status, offset=offset, limit=limit)
+    return JSONResponse(content={"items": items, "total": total, "offset": offset, "limit": limit},
+                        headers={"X-Total-Count": str(total)})
+
+
 @app.post("/llm/query")
 async def llm_query(request: Request, text: str = Form(None), audio_file: UploadFile = File(None), voiceId: str = Form("en-US-katie")):
     
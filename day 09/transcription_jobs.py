@@ -0,0 +1,210 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import assemblyai as asai
+
+# --- Batch Transcription Jobs ---
+# A job is a batch of files and/or URLs. Every item is recorded in a local SQLite
+# store before the request returns, and a fixed pool of workers submits them to
+# AssemblyAI and waits for the results, one item per worker at a time. Uploaded
+# files are kept on disk only until their item finishes. Each item's AssemblyAI
+# transcript id is stored as soon as it is submitted, so after a restart the
+# workers resume waiting on that transcript instead of uploading it again.
+# The store's queries run on its own thread and the workers' blocking AssemblyAI
+# calls on a thread pool of their own, sized to the worker count, so neither
+# the event loop nor the threadpool that serves requests ever waits on them.
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "8"))
+JOBS_DB_PATH = os.getenv("TRANSCRIBE_JOBS_DB", "transcription_jobs.db")
+ITEM_STATUSES = ("queued", "processing", "completed", "error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    kind TEXT NOT NULL,              -- "file" (source is a local path) or "url"
+    source TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    transcript_id TEXT,
+    text TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_by_job ON items(job_id, id);
+CREATE INDEX IF NOT EXISTS items_by_status ON items(status, id);
+"""
+
+
+class JobStore:
+    """SQLite-backed job and item state. Every query runs on the store's own thread."""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        self.db = self._executor.submit(self._connect, path).result()
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path)
+        db.row_factory = sqlite3.Row
+        db.executescript(SCHEMA)
+        return db
+
+    async def _run(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    async def create_job(self, sources: List[dict]) -> str:
+        return await self._run(self._create_job, sources)
+
+    async def recover(self) -> int:
+        """Re-queues items a previous process was working on; returns how many."""
+        return await self._run(self._recover)
+
+    async def claim_next(self) -> Optional[sqlite3.Row]:
+        return await self._run(self._claim_next)
+
+    async def finish(self, item_id: int, text: Optional[str] = None, error: Optional[str] = None):
+        await self._run(self._finish, item_id, text, error)
+
+    async def job(self, job_id: str) -> Optional[dict]:
+        return await self._run(self._job, job_id)
+
+    async def items(self, job_id: str, status: Optional[str] = None, offset: int = 0, limit: int = 50) -> Tuple[List[dict], int]:
+        return await self._run(self._items, job_id, status, offset, limit)
+
+    def set_transcript_id(self, item_id: int, transcript_id: str):
+        """For worker threads: records the id on the store's thread and waits until it is written."""
+        self._executor.submit(self._set_transcript_id, item_id, transcript_id).result()
+
+    def close(self):
+        self._executor.submit(self.db.close).result()
+        self._executor.shutdown()
+
+    def _create_job(self, sources: List[dict]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.db:
+            self.db.execute("INSERT INTO jobs (id, created_at) VALUES (?, ?)", (job_id, now))
+            self.db.executemany(
+                "INSERT INTO items (job_id, kind, source, name, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, item["kind"], item["source"], item["name"], now) for item in sources],
+            )
+        return job_id
+
+    def _recover(self) -> int:
+        with self.db:
+            return self.db.execute("UPDATE items SET status = 'queued' WHERE status = 'processing'").rowcount
+
+    def _claim_next(self) -> Optional[sqlite3.Row]:
+        row = self.db.execute("SELECT * FROM items WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row:
+            with self.db:
+                self.db.execute("UPDATE items SET status = 'processing', updated_at = ? WHERE id = ?", (time.time(), row["id"]))
+        return row
+
+    def _set_transcript_id(self, item_id: int, transcript_id: str):
+        with self.db:
+            self.db.execute("UPDATE items SET transcript_id = ?, updated_at = ? WHERE id = ?", (transcript_id, time.time(), item_id))
+
+    def _finish(self, item_id: int, text: Optional[str], error: Optional[str]):
+        status = "error" if error else "completed"
+        with self.db:
+            self.db.execute("UPDATE items SET status = ?, text = ?, error = ?, updated_at = ? WHERE id = ?",
+                            (status, text, error, time.time(), item_id))
+
+    def _job(self, job_id: str) -> Optional[dict]:
+        job = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not job:
+            return None
+        counts = {status: 0 for status in ITEM_STATUSES}
+        for row in self.db.execute("SELECT status, COUNT(*) AS n FROM items WHERE job_id = ? GROUP BY status", (job_id,)):
+            counts[row["status"]] = row["n"]
+        total = sum(counts.values())
+        if counts["queued"] + counts["processing"]:
+            status = "running" if counts["processing"] or counts["completed"] or counts["error"] else "queued"
+        else:
+            status = "completed_with_errors" if counts["error"] else "completed"
+        return {"job_id": job_id, "status": status, "created_at": job["created_at"], "total": total, "counts": counts}
+
+    def _items(self, job_id: str, status: Optional[str], offset: int, limit: int) -> Tuple[List[dict], int]:
+        where, args = "job_id = ?", [job_id]
+        if status:
+            where += " AND status = ?"
+            args.append(status)
+        total = self.db.execute(f"SELECT COUNT(*) FROM items WHERE {where}", args).fetchone()[0]
+        rows = self.db.execute(f"SELECT id, name, kind, status, transcript_id, text, error FROM items WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+                               args + [limit, offset]).fetchall()
+        return [dict(row) for row in rows], total
+
+
+def _transcribe_item(item: sqlite3.Row, on_submitted) -> str:
+    """Blocking: submits the item (unless already submitted) and waits for its transcript."""
+    transcript_id = item["transcript_id"]
+    if not transcript_id:
+        submitted = asai.Transcriber().submit(item["source"])
+        transcript_id = submitted.id
+        on_submitted(transcript_id)
+    transcript = asai.Transcript.get_by_id(transcript_id)
+    if transcript.status not in (asai.TranscriptStatus.completed, asai.TranscriptStatus.error):
+        transcript = transcript.wait_for_completion()
+    if transcript.status == asai.TranscriptStatus.error:
+        raise Exception(transcript.error)
+    return transcript.text or ""
+
+
+class TranscriptionWorkers:
+    """A fixed number of workers draining queued items from the store."""
+
+    def __init__(self, store: JobStore, workers: int = TRANSCRIBE_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+        self._work_available = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        requeued = await self.store.recover()
+        if requeued:
+            print(f"Resuming {requeued} transcription item(s) from a previous run.")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.notify()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def notify(self):
+        self._work_available.set()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.store.claim_next()
+            if item is None:
+                self._work_available.clear()
+                await self._work_available.wait()
+                continue
+
+            def on_submitted(transcript_id, item_id=item["id"]):
+                self.store.set_transcript_id(item_id, transcript_id)  # Called from the worker thread.
+
+            try:
+                text = await loop.run_in_executor(self._executor, _transcribe_item, item, on_submitted)
+                await self.store.finish(item["id"], text=text)
+            except Exception as e:
+                await self.store.finish(item["id"], error=str(e) or e.__class__.__name__)
+            if item["kind"] == "file":
+                try:
+                    os.remove(item["source"])
+                except OSError:
+                    pass
@@ -2,15 +2,14 @@ from fastapi import FastAPI, Form, Request, UploadFile, File, Path
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import requests
 import os
-import shutil
+import asyncio
 import assemblyai as aai 
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
-import uuid
-import time
 
 # Load environment variables from .env
 load_dotenv()
@@ -49,6 +48,18 @@ os.makedirs(UPLOADS_DIR, exist_ok=True)
 # In-memory datastore for chat histories
 chat_histories = {}
 
+# Uploads are streamed straight from the request's spooled file into AssemblyAI's
+# upload endpoint, in a worker thread, so nothing is copied to disk and the event
+# loop keeps serving other requests. The semaphore caps concurrent transcriptions.
+TRANSCRIBE_MAX_CONCURRENCY = int(os.getenv("TRANSCRIBE_MAX_CONCURRENCY", "4"))
+transcription_slots = asyncio.Semaphore(TRANSCRIBE_MAX_CONCURRENCY)
+
+
+async def transcribe_upload(audio_file: UploadFile):
+    async with transcription_slots:
+        await audio_file.seek(0)
+        return await run_in_threadpool(aai.Transcriber().transcribe, audio_file.file)
+
 
 @app.get("/")
 async def home(request: Request):
@@ -98,18 +109,7 @@ async def tts_echo(audio_file: UploadFile = File(...), voiceId: str = Form("en-U
         return JSONResponse(status_code=500, content={"error": "API keys not configured."})
 
     try:
-        transcriber = aai.Transcriber()
-        saved_name = f"echo_{int(time.time())}_{uuid.uuid4().hex}_{audio_file.filename}"
-        save_path = os.path.join(UPLOADS_DIR, saved_name)
-        with open(save_path, "wb") as out_f:
-            shutil.copyfileobj(audio_file.file, out_f)
-
-        transcript = transcriber.transcribe(save_path)
-
-        try:
-            os.remove(save_path)
-        except Exception:
-            pass
+        transcript = await transcribe_upload(audio_file)
 
         if transcript.status == aai.TranscriptStatus.error:
             raise Exception(transcript.error)
@@ -123,7 +123,7 @@ async def tts_echo(audio_file: UploadFile = File(...), voiceId: str = Form("en-U
         murf_headers = {"Accept": "application/json", "Content-Type": "application/json", "api-key": MURF_API_KEY}
         murf_payload = {"text": transcribed_text, "voiceId": voiceId, "format": "MP3", "sampleRate": 24000}
         
-        murf_response = requests.post(murf_url, json=murf_payload, headers=murf_headers)
+        murf_response = await run_in_threadpool(requests.post, murf_url, json=murf_payload, headers=murf_headers)
         murf_response.raise_for_status() 
         
         murf_audio_url = murf_response.json().get("audioFile")
@@ -166,18 +166,7 @@ async def llm_query(request: Request, text: str = Form(None), audio_file: Upload
             if not ASSEMBLYAI_API_KEY or not MURF_API_KEY or not GEMINI_API_KEY:
                 return JSONResponse(status_code=500, content={"error": "One or more required API keys are not configured."})
 
-            unique_name = f"llm_input_{int(time.time())}_{uuid.uuid4().hex}_{audio_file.filename}"
-            save_path = os.path.join(UPLOADS_DIR, unique_name)
-            with open(save_path, "wb") as out_f:
-                shutil.copyfileobj(audio_file.file, out_f)
-
-            transcriber = aai.Transcriber()
-            transcript = transcriber.transcribe(save_path)
-
-            try:
-                os.remove(save_path)
-            except Exception:
-                pass
+            transcript = await transcribe_upload(audio_file)
 
             if transcript.status == aai.TranscriptStatus.error:
                 raise Exception(f"Transcription failed: {transcript.error}")
@@ -190,13 +179,13 @@ async def llm_query(request: Request, text: str = Form(None), audio_file: Upload
             llm_response_text = None
             try:
                 model = genai.GenerativeModel('gemini-1.5-flash')
-                llm_obj = model.generate_content(transcribed_text)
+                llm_obj = await run_in_threadpool(model.generate_content, transcribed_text)
                 llm_response_text = llm_obj.text
             except Exception:
                 try:
                     url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent?key={GEMINI_API_KEY}"
                     payload = {"contents": [{"parts": [{"text": transcribed_text}]}]}
-                    resp = requests.post(url, json=payload)
+                    resp = await run_in_threadpool(requests.post, url, json=payload)
                     resp.raise_for_status()
                     resp_json = resp.json()
                     llm_response_text = resp_json["candidates"][0]["content"]["parts"][0]["text"]
@@ -206,7 +195,7 @@ async def llm_query(request: Request, text: str = Form(None), audio_file: Upload
             if not llm_response_text:
                 return JSONResponse(status_code=500, content={"error": "LLM returned empty response."})
 
-            murf_audio_url = murf_tts(llm_response_text, voiceId)
+            murf_audio_url = await run_in_threadpool(murf_tts, llm_response_text, voiceId)
 
             return JSONResponse(content={
                 "llm_response_text": llm_response_text,
@@ -255,8 +244,7 @@ async def agent_chat(
         return JSONResponse(status_code=500, content={"error": "One or more API keys are not configured."})
 
     try:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file.file)
+        transcript = await transcribe_upload(audio_file)
 
         if transcript.status == aai.TranscriptStatus.error:
             return JSONResponse(status_code=500, content={"error": f"Transcription failed: {transcript.error}"})
@@ -271,7 +259,7 @@ async def agent_chat(
         model = genai.GenerativeModel('gemini-1.5-flash')
         
         chat = model.start_chat(history=session_history)
-        response = chat.send_message(user_query_text)
+        response = await run_in_threadpool(chat.send_message, user_query_text)
         llm_response_text = response.text
 
         chat_histories[session_id] = chat.history
@@ -280,7 +268,7 @@ async def agent_chat(
         murf_headers = {"Accept": "application/json", "Content-Type": "application/json", "api-key": MURF_API_KEY}
         murf_payload = {"text": llm_response_text, "voiceId": voiceId, "format": "MP3", "sampleRate": 24000}
         
-        murf_response = requests.post(murf_url, json=murf_payload, headers=murf_headers)
+        murf_response = await run_in_threadpool(requests.post, murf_url, json=murf_payload, headers=murf_headers)
         murf_response.raise_for_status() 
         
         murf_data = murf_response.json()
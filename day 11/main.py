@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Form, Request, UploadFile, File, Path
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from dotenv import load_dotenv
@@ -11,6 +11,7 @@ import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import uuid
 import time
+import asyncio
 
 # Load environment variables from .env
 load_dotenv()
@@ -49,6 +50,8 @@ os.makedirs(UPLOADS_DIR, exist_ok=True)
 # In-memory datastore for chat histories
 chat_histories = {}
 
+FALLBACK_TEXT = "I'm having trouble connecting right now."
+
 
 @app.get("/")
 async def home(request: Request):
@@ -75,6 +78,75 @@ def generate_murf_audio(text_to_speak: str, voice_id: str):
     return audio_url
 
 
+# --- Pre-synthesized System Phrases ---
+# Fixed lines are voiced once (or loaded from PHRASES_DIR) so error paths never
+# have to call Murf at the moment it may be the service that is failing.
+PHRASES_DIR = "phrases"
+os.makedirs(PHRASES_DIR, exist_ok=True)
+DEFAULT_VOICE_ID = "en-US-katie"
+SYSTEM_PHRASES = {
+    "fallback": FALLBACK_TEXT,
+    "no_speech": "I didn't catch that. Could you please say it again?",
+    "not_configured": "I'm not fully set up yet. Please check the server configuration.",
+}
+phrase_audio = {}  # (phrase_key, voice_id) -> MP3 bytes
+warming_voices = set()
+
+
+def load_or_synthesize_phrases(voice_id: str = DEFAULT_VOICE_ID, synthesize: bool = True):
+    """Loads every system phrase for a voice into memory, voicing any that are missing on disk."""
+    for phrase_key, text in SYSTEM_PHRASES.items():
+        if (phrase_key, voice_id) in phrase_audio:
+            continue
+        path = os.path.join(PHRASES_DIR, f"{phrase_key}_{voice_id}.mp3")
+        try:
+            if not os.path.exists(path):
+                if not synthesize:
+                    continue
+                audio_response = requests.get(generate_murf_audio(text, voice_id), timeout=30)
+                audio_response.raise_for_status()
+                with open(path, "wb") as out_f:
+                    out_f.write(audio_response.content)
+            with open(path, "rb") as in_f:
+                phrase_audio[(phrase_key, voice_id)] = in_f.read()
+        except Exception as e:
+            print(f"Warning: could not prepare system phrase '{phrase_key}' for {voice_id}: {e}")
+    if any((phrase_key, voice_id) not in phrase_audio for phrase_key in SYSTEM_PHRASES):
+        warming_voices.discard(voice_id)  # Retry on the next successful request.
+
+
+def warm_phrases_for_voice(voice_id: str):
+    """Voices the system phrases for another voice in the background, once per voice."""
+    if voice_id in warming_voices or not MURF_API_KEY:
+        return
+    warming_voices.add(voice_id)
+    asyncio.get_running_loop().run_in_executor(None, load_or_synthesize_phrases, voice_id)
+
+
+def phrase_audio_url(phrase_key: str, voice_id: str):
+    """Returns the local URL of a pre-synthesized phrase, preferring the requested voice."""
+    for candidate in (voice_id, DEFAULT_VOICE_ID):
+        if (phrase_key, candidate) in phrase_audio:
+            return f"/phrases/{phrase_key}?voiceId={candidate}"
+    return None
+
+
+@app.on_event("startup")
+async def warm_system_phrases():
+    # Local artifacts load right away; anything missing is voiced in the background
+    # so a Murf outage never delays startup.
+    load_or_synthesize_phrases(synthesize=False)
+    warm_phrases_for_voice(DEFAULT_VOICE_ID)
+
+
+@app.get("/phrases/{phrase_key}")
+async def get_phrase_audio(phrase_key: str, voiceId: str = DEFAULT_VOICE_ID):
+    audio = phrase_audio.get((phrase_key, voiceId))
+    if audio is None:
+        return JSONResponse(status_code=404, content={"error": "Phrase audio not available."})
+    return Response(content=audio, media_type="audio/mpeg", headers={"Cache-Control": "public, max-age=86400"})
+
+
 # --- Original Endpoints (TTS, Echo Bot, etc.) with enhanced error handling ---
 @app.post("/tts")
 async def tts(text: str = Form(...), voiceId: str = Form("en-US-natalie")):
@@ -222,7 +294,7 @@ async def agent_chat(
     voiceId: str = Form("en-US-katie")
 ):
     if not (GEMINI_API_KEY and ASSEMBLYAI_API_KEY and MURF_API_KEY):
-        return JSONResponse(status_code=500, content={"error": "One or more API keys are not configured."})
+        return JSONResponse(status_code=500, content={"error": "One or more API keys are not configured.", "audio_url": phrase_audio_url("not_configured", voiceId)})
 
     user_query_text = ""
     try:
@@ -236,7 +308,7 @@ async def agent_chat(
         if not user_query_text:
             history = chat_histories.get(session_id, [])
             history_dicts = [{"role": msg.role, "text": msg.parts[0].text} for msg in history]
-            return JSONResponse(content={"history": history_dicts, "audio_url": ""})
+            return JSONResponse(content={"history": history_dicts, "audio_url": phrase_audio_url("no_speech", voiceId) or ""})
 
         session_history = chat_histories.get(session_id, [])
         model = genai.GenerativeModel('gemini-2.5-flash')
@@ -246,6 +318,7 @@ async def agent_chat(
         chat_histories[session_id] = chat.history  
 
         audio_url = generate_murf_audio(llm_response_text, voiceId)
+        warm_phrases_for_voice(voiceId)
 
         history_dicts = [{"role": msg.role, "text": msg.parts[0].text} for msg in chat.history]
         return JSONResponse(content={"history": history_dicts, "audio_url": audio_url})
@@ -253,12 +326,9 @@ async def agent_chat(
     except Exception as e:
         print(f"An error occurred in agent_chat: {e}") 
 
-        fallback_text = "I'm having trouble connecting right now."
-        fallback_audio_url = None
-        try:
-            fallback_audio_url = generate_murf_audio(fallback_text, voiceId)
-        except Exception as tts_e:
-            print(f"Could not generate fallback audio: {tts_e}")
+        # Served from memory: no TTS call while the upstream services are failing.
+        fallback_text = FALLBACK_TEXT
+        fallback_audio_url = phrase_audio_url("fallback", voiceId)
 
         current_history = chat_histories.get(session_id, [])
         history_dicts = [{"role": msg.role, "text": msg.parts[0].text} for msg in current_history]
@@ -1,16 +1,21 @@
 # main.py
 
-from fastapi import FastAPI, Form, Request, UploadFile, File, Path, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Path, Query, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from dotenv import load_dotenv
 import logging
+import asyncio
+import hashlib
+from typing import Optional
 
 load_dotenv()
 
 # Import services and schemas AFTER loading .env
-from services import assemblyai_service, gemini_service, murf_service
+from services import assemblyai_service, gemini_service, murf_service, audio_preprocessing
+from services.uploads import read_audio_form
+from services.session_store import session_store, keep_sessions_tidy
 from schemas.chat_schemas import ChatHistoryResponse, AgentChatResponse
 
 # --- Initial Configuration ---
@@ -23,9 +28,6 @@ app = FastAPI(title="Dhwani Bot AI Agent")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# --- In-memory Datastore ---
-chat_histories = {}
-
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -59,71 +61,167 @@ async def home(request: Request):
 
 
 # --- Voice Service Endpoint ---
+@app.on_event("startup")
+async def start_voice_catalog_refresh():
+    if murf_service.MURF_API_KEY:
+        asyncio.create_task(murf_service.keep_voice_catalog_fresh())
+
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    asyncio.create_task(keep_sessions_tidy(session_store))
+
+
+@app.on_event("shutdown")
+async def close_service_clients():
+    await murf_service.close_http_session()
+    audio_preprocessing.shutdown_process_pool()
+
+
 @app.get("/voices", response_model=list)
-async def get_voices():
+async def get_voices(
+    request: Request,
+    locale: Optional[str] = None,
+    gender: Optional[str] = None,
+    style: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
     try:
-        return murf_service.get_available_voices()
+        if not murf_service.voice_catalog.voices:
+            await asyncio.get_running_loop().run_in_executor(None, murf_service.voice_catalog.refresh)
+        voices, total = murf_service.voice_catalog.query(locale=locale, gender=gender, style=style, offset=offset, limit=limit)
     except Exception as e:
         logger.error(f"Error fetching voices: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    query_hash = hashlib.sha1(str(request.query_params).encode("utf-8")).hexdigest()[:8]
+    etag = f'"{murf_service.voice_catalog.version}-{query_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Total-Count": str(total)}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=voices, headers=headers)
+
+
+# --- Transcription Endpoint ---
+@app.post("/transcribe/file")
+async def transcribe_file(request: Request):
+    try:
+        audio_file, _ = await read_audio_form(request)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": "Invalid upload.", "details": str(e)})
+    if audio_file is None:
+        return JSONResponse(status_code=400, content={"error": "No `audio_file` provided."})
+    try:
+        transcript_text = await asyncio.get_running_loop().run_in_executor(None, assemblyai_service.transcribe_audio, audio_file)
+        return JSONResponse(content={"transcript": transcript_text})
+    except Exception as e:
+        logger.error(f"Error transcribing file: {e}")
+        return JSONResponse(status_code=500, content={"error": "Transcription failed.", "details": str(e)})
+    finally:
+        audio_file.close()
+
 
 # --- Conversational Agent Endpoints ---
+HISTORY_PAGE_SIZE = 50  # Stored turns per history page, tool calls included.
+
+
 def convert_history_to_dicts(history) -> list[dict]:
-    """Helper to convert Gemini's history object to a list of dicts for our schema."""
+    """Helper to convert a stored history to a list of dicts for our schema."""
     if not history:
         return []
-    return [{"role": msg.role, "text": msg.parts[0].text} for msg in history]
+    return [{"role": turn.role, "text": turn.text} for turn in history if turn.tool_name is None]
 
 
 @app.get("/agent/chat/{session_id}", response_model=ChatHistoryResponse)
-async def get_chat_history(session_id: str):
-    history = chat_histories.get(session_id, [])
-    return ChatHistoryResponse(history=convert_history_to_dicts(history))
+async def get_chat_history(
+    request: Request,
+    session_id: str,
+    since: Optional[int] = Query(None, ge=0, description="A next_cursor from an earlier response; only newer turns are returned."),
+    before: Optional[int] = Query(None, ge=0, description="A prev_cursor from an earlier response; returns the page before it."),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=500)
+):
+    # Cursors are absolute turn indexes, so a poll only slices the turns it returns
+    # and an unchanged session is answered from its version alone.
+    history, base, version = session_store.get_versioned(session_id)
+    query_hash = hashlib.sha1(str(request.query_params).encode("utf-8")).hexdigest()[:8]
+    etag = f'"{version}-{query_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    end = base + len(history)
+    reset = since is not None and since > end
+    if since is not None:
+        start = base if reset else max(since, base)
+        stop = min(start + limit, end)
+    else:
+        stop = end if before is None else max(base, min(before, end))
+        start = max(base, stop - limit)
+    page = ChatHistoryResponse(
+        history=convert_history_to_dicts(history[start - base:stop - base]),
+        next_cursor=stop,
+        prev_cursor=start if start > base else None,
+        has_more=stop < end,
+        reset=reset
+    )
+    return JSONResponse(content=page.model_dump(), headers=headers)
 
 
 @app.delete("/agent/chat/{session_id}")
 async def clear_chat_history(session_id: str):
-    if session_id in chat_histories:
-        del chat_histories[session_id]
+    if session_id in session_store:
+        session_store.delete(session_id)
         logger.info(f"Chat history cleared for session: {session_id}")
     return JSONResponse(content={"message": "Chat history cleared."})
 
 
+@app.get("/agent/sessions/stats")
+async def get_session_stats():
+    return JSONResponse(content=session_store.stats())
+
+
 @app.post("/agent/chat/{session_id}")
 async def agent_chat(
+    request: Request,
     session_id: str = Path(..., description="The unique ID for the chat session."),
-    audio_file: UploadFile = File(...),
-    voiceId: str = Form("en-US-katie")
 ):
+    # The form (audio_file, voiceId) is read by hand so the audio is hashed as it is spooled.
+    try:
+        audio_file, form = await read_audio_form(request)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": "Invalid upload.", "details": str(e)})
+    if audio_file is None:
+        return JSONResponse(status_code=400, content={"error": "No `audio_file` provided."})
+    voiceId = form.get("voiceId") or "en-US-katie"
     try:
         # 1. Transcribe User Audio -> Text
-        user_query_text = assemblyai_service.transcribe_audio(audio_file)
+        user_query_text = await asyncio.get_running_loop().run_in_executor(None, assemblyai_service.transcribe_audio, audio_file)
         logger.info(f"[{session_id}] User Query: {user_query_text}")
 
         if not user_query_text:
-            history = chat_histories.get(session_id, [])
+            history = session_store.get(session_id)
             return AgentChatResponse(history=convert_history_to_dicts(history), audio_url=None)
 
         # 2. Get LLM Response
-        session_history = chat_histories.get(session_id, [])
+        session_history = session_store.get(session_id)
         llm_response_text, updated_history = gemini_service.get_chat_response(session_history, user_query_text)
-        chat_histories[session_id] = updated_history
+        session_store.put(session_id, updated_history)
         logger.info(f"[{session_id}] LLM Response: {llm_response_text}")
 
-        # 3. Generate TTS Audio from LLM Response
-        audio_url = murf_service.generate_murf_audio(llm_response_text, voiceId)
+        # 3. Generate TTS Audio from LLM Response, one sentence per clip, voiced in parallel
+        audio_urls = await murf_service.generate_murf_playlist(llm_response_text, voiceId)
         
-        return AgentChatResponse(history=convert_history_to_dicts(updated_history), audio_url=audio_url)
+        return AgentChatResponse(history=convert_history_to_dicts(updated_history), audio_url=audio_urls[0], audio_urls=audio_urls)
 
     except Exception as e:
         logger.error(f"An error occurred in agent_chat for session {session_id}: {e}", exc_info=True)
         fallback_text = "I'm having trouble connecting. Please try again later."
-        history_dicts = convert_history_to_dicts(chat_histories.get(session_id, []))
+        history_dicts = convert_history_to_dicts(session_store.get(session_id))
         
         return JSONResponse(
             status_code=500,
             content={"error": str(e), "history": history_dicts, "audio_url": None, "fallback_text": fallback_text}
         )
     finally:
-        await audio_file.close()
\ No newline at end of file
+        audio_file.close()
\ No newline at end of file
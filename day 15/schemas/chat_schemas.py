@@ -9,13 +9,18 @@ class Message(BaseModel):
     text: str
 
 class ChatHistoryResponse(BaseModel):
-    """Response model for fetching chat history."""
+    """Response model for fetching chat history, one page at a time."""
     history: List[Message]
+    next_cursor: int = 0                # Pass as `since` to get only turns newer than this page.
+    prev_cursor: Optional[int] = None   # Pass as `before` for the page before this one; None at the start.
+    has_more: bool = False              # More turns after this page (when paging forward with `since`).
+    reset: bool = False                 # The `since` cursor is from a cleared session; this page starts over.
 
 class AgentChatResponse(BaseModel):
     """Response model for a successful chat interaction."""
     history: List[Message]
     audio_url: Optional[str] = None
+    audio_urls: List[str] = []  # The reply voiced sentence by sentence, in playback order.
 
 class ErrorResponse(BaseModel):
     """Response model for errors, includes context."""
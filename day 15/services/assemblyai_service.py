@@ -2,8 +2,10 @@
 
 import os
 import assemblyai as aai
-from fastapi import UploadFile
 import logging
+from services.transcript_cache import transcript_cache, content_key
+from services.audio_preprocessing import prepare_for_stt
+from services.uploads import SpooledUpload
 
 # Configure the AssemblyAI API key
 # This reads the key from your .env file
@@ -13,18 +15,29 @@ if ASSEMBLYAI_API_KEY:
 else:
     logging.warning("ASSEMBLYAI_API_KEY not found. Transcription will fail.")
 
-def transcribe_audio(audio_file: UploadFile) -> str:
-    """Transcribes the given audio file using the AssemblyAI API."""
+# Part of the transcript cache key: changing these must not serve transcripts made with the old ones.
+TRANSCRIPTION_SETTINGS = {"punctuate": True, "format_text": True}
+
+def transcribe_audio(audio_file: SpooledUpload) -> str:
+    """Transcribes the given audio file using the AssemblyAI API. Blocking; call it off the event loop."""
     if not aai.settings.api_key:
         raise Exception("Speech-to-text service is not configured.")
 
+    # Identical audio with identical settings is answered from the cache.
+    cache_key = content_key(audio_file.sha256, TRANSCRIPTION_SETTINGS)
+    cached_text = transcript_cache.get(cache_key)
+    if cached_text is not None:
+        logging.info(f"Transcript cache hit for {cache_key[:12]}.")
+        return cached_text
+
     try:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(audio_file.file)
+        transcriber = aai.Transcriber(config=aai.TranscriptionConfig(**TRANSCRIPTION_SETTINGS))
+        transcript = transcriber.transcribe(prepare_for_stt(audio_file.file))
 
         if transcript.status == aai.TranscriptStatus.error:
             raise Exception(f"Transcription failed: {transcript.error}")
 
+        transcript_cache.put(cache_key, transcript.text or "")
         return transcript.text or ""
     except Exception as e:
         logging.error(f"An error occurred during transcription: {e}")
@@ -0,0 +1,166 @@
+# /services/audio_preprocessing.py
+
+import io
+import os
+import shutil
+import logging
+import subprocess
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import BinaryIO, Optional
+
+import numpy as np
+
+# Optional (TRANSCODE_UPLOADS=true): browser recordings (48 kHz WAV, webm/opus) are
+# decoded to 16 kHz mono, which is all STT needs, with leading and trailing silence
+# trimmed, before they are uploaded. ffmpeg reads the spooled upload directly, so the
+# clip is never copied into memory; without ffmpeg, PCM WAV clips small enough to
+# still be spooled in memory are converted in a process pool. Whatever runs gets
+# TRANSCODE_TIMEOUT_SECONDS, and if it fails, times out or does not shrink the
+# audio, the original is uploaded.
+TRANSCODE_UPLOADS = os.getenv("TRANSCODE_UPLOADS", "false").lower() == "true"
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", "2"))
+TRANSCODE_MIN_BYTES = 64 * 1024  # Smaller clips upload faster than they transcode.
+TRANSCODE_MAX_IN_MEMORY_BYTES = 1024 * 1024  # Starlette's spool size; the WAV fallback only takes clips this small.
+TRANSCODE_TIMEOUT_SECONDS = int(os.getenv("TRANSCODE_TIMEOUT_SECONDS", "15"))
+TARGET_SAMPLE_RATE = 16000
+SILENCE_THRESHOLD_DB = -45.0  # dBFS; quieter 10 ms frames at either end are trimmed.
+SILENCE_PAD_MS = 200          # Kept around the speech so word edges are not clipped.
+FFMPEG = shutil.which("ffmpeg")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()  # Callers run in executor threads; only one may create the pool.
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=TRANSCODE_WORKERS)
+        return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ffmpeg_transcode(audio: BinaryIO) -> Optional[bytes]:
+    """Any container/codec ffmpeg understands -> trimmed 16 kHz mono FLAC.
+
+    ffmpeg reads the upload's file descriptor itself (an in-memory spool is rolled
+    over to its temporary file first), so the clip never passes through Python.
+    """
+    trim = f"silenceremove=start_periods=1:start_threshold={SILENCE_THRESHOLD_DB}dB:start_silence={SILENCE_PAD_MS / 1000}"
+    command = [FFMPEG, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+               "-af", f"{trim},areverse,{trim},areverse",
+               "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "-c:a", "flac", "-f", "flac", "pipe:1"]
+    audio.seek(0)
+    audio.flush()
+    try:
+        result = subprocess.run(command, stdin=audio, capture_output=True, timeout=TRANSCODE_TIMEOUT_SECONDS)
+    finally:
+        audio.seek(0)
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout
+
+
+def _lowpass(samples: np.ndarray, cutoff: float, taps: int = 63) -> np.ndarray:
+    """Windowed-sinc FIR; cutoff is a fraction of the input sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.blackman(taps)
+    return np.convolve(samples, kernel / kernel.sum(), mode="same")
+
+
+def _trim_silence(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    frame = sample_rate // 100
+    usable = samples.size - samples.size % frame
+    if not usable:
+        return samples
+    rms = np.sqrt(np.mean(samples[:usable].reshape(-1, frame) ** 2, axis=1))
+    voiced = np.flatnonzero(20 * np.log10(rms / 32768.0 + 1e-10) > SILENCE_THRESHOLD_DB)
+    if not voiced.size:
+        return samples
+    pad = SILENCE_PAD_MS * sample_rate // 1000
+    return samples[max(0, voiced[0] * frame - pad):min(samples.size, (voiced[-1] + 1) * frame + pad)]
+
+
+def _wav_transcode(data: bytes) -> Optional[bytes]:
+    """PCM16 WAV at any rate/channel count -> trimmed 16 kHz mono PCM16 WAV, without ffmpeg."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                return None
+            channels, rate = wav.getnchannels(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+    samples = samples[:samples.size - samples.size % channels].reshape(-1, channels).mean(axis=1)
+    samples = _trim_silence(samples, rate)
+    if rate != TARGET_SAMPLE_RATE:
+        if rate > TARGET_SAMPLE_RATE:
+            samples = _lowpass(samples, 0.5 * TARGET_SAMPLE_RATE / rate * 0.9)
+        positions = np.arange(0, samples.size, rate / TARGET_SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(samples.size), samples)
+
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(TARGET_SAMPLE_RATE)
+        wav.writeframes(np.clip(np.round(samples), -32768, 32767).astype("<i2").tobytes())
+    return out.getvalue()
+
+
+def transcode_for_stt(data: bytes) -> Optional[bytes]:
+    """Runs in a pool process. Returns the processed WAV, or None if it could not be decoded."""
+    try:
+        return _wav_transcode(data)
+    except Exception as e:
+        logging.warning(f"Audio pre-processing failed, the original upload will be used: {e}")
+        return None
+
+
+def _transcode(audio: BinaryIO, size: int) -> Optional[bytes]:
+    if FFMPEG:
+        try:
+            return _ffmpeg_transcode(audio)
+        except (OSError, subprocess.SubprocessError) as e:
+            logging.warning(f"ffmpeg pre-processing failed, the original upload will be used: {e}")
+            return None
+    if size > TRANSCODE_MAX_IN_MEMORY_BYTES:
+        return None
+    data = audio.read()
+    audio.seek(0)
+    future = get_process_pool().submit(transcode_for_stt, data)
+    try:
+        return future.result(timeout=TRANSCODE_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        logging.warning(f"Audio pre-processing took over {TRANSCODE_TIMEOUT_SECONDS}s, the original upload will be used.")
+        return None
+
+
+def prepare_for_stt(audio: BinaryIO) -> BinaryIO:
+    """Returns a smaller 16 kHz mono version of the upload when possible, else the upload itself.
+
+    Blocks the calling thread while the audio is processed, so call it off the event loop.
+    """
+    audio.seek(0, os.SEEK_END)
+    size = audio.tell()
+    audio.seek(0)
+    if not TRANSCODE_UPLOADS or size < TRANSCODE_MIN_BYTES:
+        return audio
+
+    processed = _transcode(audio, size)
+    if not processed or len(processed) >= size:
+        return audio
+    logging.info(f"Pre-processed upload for STT: {size} -> {len(processed)} bytes.")
+    return io.BytesIO(processed)
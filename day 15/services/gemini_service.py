@@ -3,7 +3,8 @@
 import os
 import google.generativeai as genai
 import logging
-from typing import List, Dict
+from typing import List
+from services.turns import Turn, to_wire_history
 
 # Configure the Gemini API key
 # This reads the key from your .env file
@@ -13,17 +14,17 @@ if GEMINI_API_KEY:
 else:
     logging.warning("GEMINI_API_KEY not found. LLM will fail.")
 
-def get_chat_response(session_history: List[Dict], user_query: str) -> (str, List[Dict]):
-    """Gets a response from the Gemini LLM."""
+def get_chat_response(session_history: List[Turn], user_query: str) -> (str, List[Turn]):
+    """Gets a response from the Gemini LLM. Returns the reply and the history with the new exchange appended."""
     
     # THE INCORRECT CHECK HAS BEEN REMOVED FROM HERE
 
     try:
         model = genai.GenerativeModel('gemini-1.5-flash')
-        chat = model.start_chat(history=session_history)
+        chat = model.start_chat(history=to_wire_history(session_history))
         response = chat.send_message(user_query)
         
-        return response.text, chat.history
+        return response.text, session_history + [Turn.user(user_query), Turn.model(response.text)]
     except Exception as e:
         # This block will now correctly handle errors, including missing API keys.
         logging.error(f"An error occurred with the Gemini API: {e}")
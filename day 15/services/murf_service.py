@@ -1,47 +1,181 @@
 # /services/murf_service.py
 
 import requests
+import aiohttp
 import os
 import logging
+import asyncio
+import re
+import hashlib
+import json
+import threading
+import time
 
 # This reads the key from your .env file
 MURF_API_KEY = os.getenv("MURF_API_KEY")
 
-def get_available_voices() -> list:
-    """Fetches the list of available voices from Murf API."""
-    if not MURF_API_KEY:
-        raise Exception("Voice service API key is not configured.")
-    
-    url = "https://api.murf.ai/v1/speech/voices"
-    headers = {"Accept": "application/json", "api-key": MURF_API_KEY}
-    
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to connect to the voice service: {e}")
+VOICES_URL = "https://api.murf.ai/v1/speech/voices"
+VOICE_CATALOG_TTL_SECONDS = int(os.getenv("VOICE_CATALOG_TTL_SECONDS", "3600"))
+
+
+class VoiceCatalog:
+    """In-memory copy of Murf's voice list, indexed by locale, gender and style.
+
+    Refreshed with conditional requests so an unchanged catalog costs a 304.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.voices = []
+        self.by_locale = {}
+        self.by_gender = {}
+        self.by_style = {}
+        self.version = ""
+        self.fetched_at = None  # monotonic() of the last fetch; None until the first one.
+        self._upstream_etag = None
+        self._upstream_last_modified = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self.fetched_at is None or time.monotonic() - self.fetched_at > VOICE_CATALOG_TTL_SECONDS
+
+    def refresh(self) -> bool:
+        """Fetches the catalog if it changed upstream. Returns True when the contents changed."""
+        if not MURF_API_KEY:
+            raise Exception("Voice service API key is not configured.")
+
+        headers = {"Accept": "application/json", "api-key": MURF_API_KEY}
+        if self._upstream_etag:
+            headers["If-None-Match"] = self._upstream_etag
+        if self._upstream_last_modified:
+            headers["If-Modified-Since"] = self._upstream_last_modified
+
+        try:
+            response = requests.get(VOICES_URL, headers=headers, timeout=15)
+            if response.status_code == 304:
+                self.fetched_at = time.monotonic()
+                return False
+            response.raise_for_status()
+            voices = response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to connect to the voice service: {e}")
+
+        version = hashlib.sha1(json.dumps(voices, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        by_locale, by_gender, by_style = {}, {}, {}
+        for index, voice in enumerate(voices):
+            by_locale.setdefault(str(voice.get("locale", "")).lower(), []).append(index)
+            by_gender.setdefault(str(voice.get("gender", "")).lower(), []).append(index)
+            for style in voice.get("availableStyles") or []:
+                by_style.setdefault(str(style).lower(), []).append(index)
+
+        with self._lock:
+            changed = version != self.version
+            self.voices, self.by_locale, self.by_gender, self.by_style = voices, by_locale, by_gender, by_style
+            self.version = version
+            self.fetched_at = time.monotonic()
+            self._upstream_etag = response.headers.get("ETag")
+            self._upstream_last_modified = response.headers.get("Last-Modified")
+        logging.info(f"Voice catalog loaded: {len(voices)} voices (version {version}).")
+        return changed
+
+    def query(self, locale: str = None, gender: str = None, style: str = None, offset: int = 0, limit: int = None) -> (list, int):
+        """Filters the catalog from the in-memory indexes and returns one page plus the total match count."""
+        with self._lock:
+            voices = self.voices
+            candidates = None
+            for index, key in ((self.by_locale, locale), (self.by_gender, gender), (self.by_style, style)):
+                if key:
+                    matches = set(index.get(key.lower(), ()))
+                    candidates = matches if candidates is None else candidates & matches
+        positions = range(len(voices)) if candidates is None else sorted(candidates)
+        total = len(positions)
+        end = total if limit is None else offset + limit
+        return [voices[i] for i in positions[offset:end]], total
+
+
+voice_catalog = VoiceCatalog()
+
+
+async def keep_voice_catalog_fresh():
+    """Background task: re-validates the catalog every TTL without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            if voice_catalog.is_stale:
+                await loop.run_in_executor(None, voice_catalog.refresh)
+        except Exception as e:
+            logging.warning(f"Voice catalog refresh failed, serving the cached copy: {e}")
+        await asyncio.sleep(min(60, VOICE_CATALOG_TTL_SECONDS))
 
 
-def generate_murf_audio(text_to_speak: str, voice_id: str) -> str:
-    """Generates audio using Murf API and returns the audio URL."""
+# --- Async TTS Client ---
+# One pooled aiohttp session per process: TLS handshakes are paid once, and long
+# replies are voiced sentence by sentence in parallel instead of as one big request.
+MURF_GENERATE_URL = "https://api.murf.ai/v1/speech/generate"
+MURF_MAX_PARALLEL = int(os.getenv("MURF_MAX_PARALLEL", "4"))
+MIN_SENTENCE_CHARS = 40
+
+_http_session = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Returns the shared aiohttp session, creating it on first use."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=MURF_MAX_PARALLEL * 4, keepalive_timeout=60)
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60))
+    return _http_session
+
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+def split_into_sentences(text: str) -> list:
+    """Splits text at sentence ends, merging fragments too short to be worth a request of their own."""
+    sentences = []
+    for sentence in re.split(r'(?<=[.?!])\s+', text.strip()):
+        if sentences and len(sentences[-1]) < MIN_SENTENCE_CHARS:
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        elif sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+async def generate_murf_audio_async(text_to_speak: str, voice_id: str) -> str:
+    """Voices text through Murf's REST API on the pooled session and returns the audio URL."""
     if not MURF_API_KEY:
         raise Exception("Text-to-speech service is not configured.")
-    
-    url = "https://api.murf.ai/v1/speech/generate"
+
     headers = {"Accept": "application/json", "Content-Type": "application/json", "api-key": MURF_API_KEY}
     payload = {"text": text_to_speak, "voiceId": voice_id, "format": "MP3", "sampleRate": 24000}
-    
+
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        
-        data = response.json()
-        audio_url = data.get("audioFile")
-        
-        if not audio_url:
-            raise Exception("TTS service did not return an audio file.")
-            
-        return audio_url
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to connect to the text-to-speech service: {e}")
\ No newline at end of file
+        async with get_http_session().post(MURF_GENERATE_URL, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+    except aiohttp.ClientError as e:
+        raise Exception(f"Failed to connect to the text-to-speech service: {e}")
+
+    audio_url = data.get("audioFile")
+    if not audio_url:
+        raise Exception("TTS service did not return an audio file.")
+    return audio_url
+
+
+async def generate_murf_playlist(text_to_speak: str, voice_id: str, max_parallel: int = MURF_MAX_PARALLEL) -> list:
+    """Voices each sentence concurrently (at most max_parallel at once) and returns the audio URLs in reading order."""
+    sentences = split_into_sentences(text_to_speak)
+    if len(sentences) <= 1:
+        return [await generate_murf_audio_async(text_to_speak, voice_id)]
+
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def synthesize(sentence: str) -> str:
+        async with semaphore:
+            return await generate_murf_audio_async(sentence, voice_id)
+
+    return list(await asyncio.gather(*(synthesize(sentence) for sentence in sentences)))
@@ -0,0 +1,202 @@
+# /services/session_store.py
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import itertools
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from services.turns import Turn
+
+# Chat histories live here instead of an unbounded module-level dict. Histories are
+# lists of compact Turn records (see turns.py).
+#   - at most SESSION_MAX_COUNT sessions in memory; the least recently used one is
+#     evicted (spilled to disk when SESSION_SPILL_DIR is set, otherwise dropped)
+#   - at most SESSION_MAX_BYTES of serialized history per session; the oldest
+#     exchanges are trimmed first
+#   - sessions idle for SESSION_IDLE_TTL_SECONDS expire, in memory and on disk
+# Memory use is reported as the serialized size of the turns held in memory.
+# Each session also tracks its base (how many turns were ever trimmed off its front),
+# so a turn keeps the same absolute index for history paging, and a version tag that
+# changes on every store, for ETags.
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024)))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", str(2 * 3600)))
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR") or None
+SESSION_SWEEP_INTERVAL_SECONDS = 60
+
+
+def _history_bytes(history: List[Turn]) -> int:
+    return sum(turn.nbytes for turn in history)
+
+
+def _starts_exchange(turn: Turn) -> bool:
+    """A history must start with a user turn that is not a tool result."""
+    return turn.role == "user" and turn.tool_name is None
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, max_session_bytes: int = SESSION_MAX_BYTES,
+                 idle_ttl_seconds: float = SESSION_IDLE_TTL_SECONDS, spill_dir: Optional[str] = SESSION_SPILL_DIR):
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.spill_dir = spill_dir
+        self._sessions = OrderedDict()  # session_id -> [history, size_bytes, last_used, base, version]
+        self._bytes = 0
+        self._epoch = uuid.uuid4().hex[:8]  # Keeps version tags from repeating across restarts.
+        self._versions = itertools.count(1)
+        self.evictions = 0
+        self.expirations = 0
+        self.trimmed_messages = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id.replace(os.sep, '_')}.json")
+
+    def _load_spilled(self, session_id: str) -> Optional[Tuple[List[Turn], int]]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.idle_ttl_seconds:
+                os.remove(path)
+                self.expirations += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                spilled = json.load(f)
+            if isinstance(spilled, list):  # Spilled before sessions tracked their base.
+                spilled = {"base": 0, "turns": spilled}
+            history = [Turn.from_record(record) for record in spilled["turns"]]
+            os.remove(path)
+            return history, spilled["base"]
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _entry(self, session_id: str) -> Optional[list]:
+        entry = self._sessions.get(session_id)
+        if entry and time.monotonic() - entry[2] > self.idle_ttl_seconds:
+            self._drop(session_id)
+            self.expirations += 1
+            entry = None
+        if entry:
+            entry[2] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return entry
+        spilled = self._load_spilled(session_id)
+        if spilled is None:
+            return None
+        history, base = spilled
+        self.put(session_id, history, base=base)
+        return self._sessions[session_id]
+
+    def get(self, session_id: str) -> List[Turn]:
+        """Returns the session's history (empty for unknown or expired sessions)."""
+        entry = self._entry(session_id)
+        return entry[0] if entry else []
+
+    def get_versioned(self, session_id: str) -> Tuple[List[Turn], int, str]:
+        """Returns (history, base, version): base is the absolute index of history[0],
+        and version changes whenever the history is stored again."""
+        entry = self._entry(session_id)
+        if not entry:
+            return [], 0, f"{self._epoch}-0"
+        return entry[0], entry[3], entry[4]
+
+    def put(self, session_id: str, history: List[Turn], base: Optional[int] = None):
+        """Stores (or re-measures) a session's history, trimming it in place to the byte limit.
+
+        `base` is the absolute index of history[0]; by default the stored session's is kept.
+        """
+        previous = self._sessions.get(session_id)
+        if base is None:
+            base = previous[3] if previous else 0
+        size = _history_bytes(history)
+        length = len(history)
+        while history and size > self.max_session_bytes:
+            del history[0]
+            while history and not _starts_exchange(history[0]):
+                del history[0]
+                self.trimmed_messages += 1
+            self.trimmed_messages += 1
+            size = _history_bytes(history)
+        base += length - len(history)
+
+        if previous:
+            self._bytes -= previous[1]
+        self._sessions[session_id] = [history, size, time.monotonic(), base, f"{self._epoch}-{next(self._versions)}"]
+        self._sessions.move_to_end(session_id)
+        self._bytes += size
+        while len(self._sessions) > self.max_sessions:
+            self._evict_lru()
+
+    def delete(self, session_id: str):
+        if session_id in self._sessions:
+            self._drop(session_id)
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(session_id))
+            except OSError:
+                pass
+
+    def _drop(self, session_id: str):
+        entry = self._sessions.pop(session_id)
+        self._bytes -= entry[1]
+
+    def _evict_lru(self):
+        session_id, (history, size, _, base, _) = self._sessions.popitem(last=False)
+        self._bytes -= size
+        self.evictions += 1
+        if self.spill_dir and history:
+            try:
+                with open(self._spill_path(session_id), "w", encoding="utf-8") as f:
+                    json.dump({"base": base, "turns": [turn.to_record() for turn in history]}, f, ensure_ascii=False, default=str)
+            except OSError as e:
+                logging.warning(f"Could not spill session {session_id} to disk: {e}")
+
+    def sweep(self):
+        """Expires idle sessions in memory and on disk."""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        for session_id in [sid for sid, entry in self._sessions.items() if entry[2] < cutoff]:
+            self._drop(session_id)
+            self.expirations += 1
+        if self.spill_dir:
+            wall_cutoff = time.time() - self.idle_ttl_seconds
+            for entry in os.scandir(self.spill_dir):
+                try:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < wall_cutoff:
+                        os.remove(entry.path)
+                        self.expirations += 1
+                except OSError:
+                    pass
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions or bool(self.spill_dir and os.path.exists(self._spill_path(session_id)))
+
+    def stats(self) -> dict:
+        spilled = [entry for entry in os.scandir(self.spill_dir) if entry.name.endswith(".json")] if self.spill_dir else []
+        return {
+            "sessions": len(self._sessions),
+            "memory_bytes": self._bytes,
+            "spilled_sessions": len(spilled),
+            "spilled_bytes": sum(entry.stat().st_size for entry in spilled),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "trimmed_messages": self.trimmed_messages,
+        }
+
+
+async def keep_sessions_tidy(store: "SessionStore"):
+    """Background task: expires idle sessions and logs the store's footprint."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+        store.sweep()
+        logging.info(f"Session store: {store.stats()}")
+
+
+session_store = SessionStore()
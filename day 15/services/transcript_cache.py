@@ -0,0 +1,92 @@
+# /services/transcript_cache.py
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", ".transcript_cache")
+TRANSCRIPT_CACHE_MEMORY_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MEMORY_ENTRIES", "512"))
+TRANSCRIPT_CACHE_DISK_MB = int(os.getenv("TRANSCRIPT_CACHE_DISK_MB", "64"))
+
+
+def content_key(audio_sha256: str, settings: dict) -> str:
+    """Cache key for audio (by the SHA-256 taken while it was spooled, see uploads.py) under given settings."""
+    return hashlib.sha256(f"{json.dumps(settings, sort_keys=True)}\n{audio_sha256}".encode("utf-8")).hexdigest()
+
+
+class TranscriptCache:
+    """Two-level transcript cache: an LRU dict in memory over JSON files on disk.
+
+    The memory level holds a fixed number of entries; the disk level is bounded by
+    total size and evicts the least recently used files (by mtime, touched on hit).
+    """
+
+    def __init__(self, directory: str = TRANSCRIPT_CACHE_DIR, memory_entries: int = TRANSCRIPT_CACHE_MEMORY_ENTRIES,
+                 disk_bytes: int = TRANSCRIPT_CACHE_DISK_MB * 1024 * 1024):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._disk_size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".json"))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key: str, text: str):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = json.load(f)["text"]
+                os.utime(path)
+            except (OSError, ValueError, KeyError):
+                return None
+            self._remember(key, text)
+            return text
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._remember(key, text)
+            path = self._path(key)
+            try:
+                previous = os.path.getsize(path) if os.path.exists(path) else 0
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({"text": text}, f)
+                self._disk_size += os.path.getsize(path) - previous
+            except OSError as e:
+                logging.warning(f"Could not write transcript cache entry: {e}")
+                return
+            if self._disk_size > self.disk_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+                         key=lambda entry: entry.stat().st_mtime)
+        target = self.disk_bytes * 9 // 10  # Evict a little extra so every put doesn't rescan the directory.
+        for entry in entries:
+            if self._disk_size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._disk_size -= size
+            except OSError:
+                pass
+
+
+transcript_cache = TranscriptCache()
@@ -0,0 +1,124 @@
+# /services/uploads.py
+
+import hashlib
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Audio forms are parsed here rather than by FastAPI's File(...), so the upload's
+# SHA-256 (the transcript cache key, see transcript_cache.py) is taken in the same
+# loop that spools it, instead of in a second read of the whole file afterwards.
+SPOOL_MAX_MEMORY_BYTES = 1024 * 1024  # As Starlette: larger uploads roll over to a temporary file.
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class SpooledUpload:
+    """A form file spooled like Starlette's UploadFile, hashed while it was written."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def in_memory(self) -> bool:
+        return not getattr(self.file, "_rolled", True)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def write(self, data: bytes):
+        self._sha256.update(data)
+        self.file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        self.file.close()
+
+
+async def read_audio_form(request: Request, file_field: str = "audio_file") -> Tuple[Optional[SpooledUpload], Dict[str, str]]:
+    """Parses a multipart form: spools and hashes `file_field`, and returns the other fields as text.
+
+    Raises ValueError for a request that is not a well-formed multipart form.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data request.")
+
+    upload: Optional[SpooledUpload] = None
+    fields: Dict[str, str] = {}
+    headers: Dict[bytes, bytes] = {}
+    header_field, header_value = bytearray(), bytearray()
+    part: dict = {}
+    file_chunks: list = []  # File data parsed from the current request chunk, written after it.
+
+    def on_part_begin():
+        headers.clear()
+        part.clear()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        nonlocal upload
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        part["name"] = options.get(b"name", b"").decode("utf-8", "replace")
+        if part["name"] == file_field and b"filename" in options and upload is None:
+            upload = SpooledUpload(options[b"filename"].decode("utf-8", "replace"))
+            part["file"] = True
+        else:
+            part["value"] = bytearray()
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if part.get("file"):
+            file_chunks.append(data[start:end])
+            return
+        part["value"].extend(data[start:end])
+        if len(part["value"]) > MAX_FIELD_BYTES:
+            raise ValueError(f"Form field {part['name']!r} is too large.")
+
+    def on_part_end():
+        if "value" in part:
+            fields[part["name"]] = part["value"].decode("utf-8", "replace")
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin, "on_header_field": on_header_field, "on_header_value": on_header_value,
+        "on_header_end": on_header_end, "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data, "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if file_chunks:
+                data = b"".join(file_chunks)
+                file_chunks.clear()
+                # Once rolled over to disk, writes go through the threadpool, as in Starlette.
+                if upload.in_memory:
+                    upload.write(data)
+                else:
+                    await run_in_threadpool(upload.write, data)
+        parser.finalize()
+    except BaseException:
+        if upload:
+            upload.close()
+        raise
+    if upload:
+        upload.file.seek(0)
+    return upload, fields
@@ -159,19 +159,27 @@ document.addEventListener('DOMContentLoaded', () => {
                         aetherRecordBtn.innerHTML = micIcon;
                     };
 
-                    if (data.audio_url) {
-                        const audio = new Audio(data.audio_url);
-                        audioPlaybackContainer.appendChild(audio);
-                        audio.play();
-                        agentStatus.textContent = 'Playing response...';
-                        audio.onended = () => {
-                            finishInteraction();
-                            audio.remove();
-                        };
-                         audio.onerror = () => {
-                            finishInteraction();
-                            audio.remove();
+                    const playlist = data.audio_urls?.length ? data.audio_urls : (data.audio_url ? [data.audio_url] : []);
+                    if (playlist.length) {
+                        // Every clip starts loading now, so each one is ready when the previous ends.
+                        const clips = playlist.map(url => {
+                            const audio = new Audio(url);
+                            audio.preload = 'auto';
+                            audioPlaybackContainer.appendChild(audio);
+                            return audio;
+                        });
+                        const playClip = (index) => {
+                            if (index >= clips.length) {
+                                finishInteraction();
+                                return;
+                            }
+                            const audio = clips[index];
+                            audio.onended = () => { audio.remove(); playClip(index + 1); };
+                            audio.onerror = () => { audio.remove(); playClip(index + 1); };
+                            audio.play();
                         };
+                        agentStatus.textContent = 'Playing response...';
+                        playClip(0);
                     } else {
                         finishInteraction();
                     }
@@ -0,0 +1,129 @@
+import logging
+import numpy as np
+
+try:
+    import opuslib
+except ImportError:  # Optional: Opus output falls back to PCM16 without libopus.
+    opuslib = None
+
+# --- TTS Output Format Negotiation ---
+# The client asks for an encoding in its config message; Murf is asked for the
+# closest thing it can stream and anything else is transcoded here.
+DEFAULT_OUTPUT_FORMAT = {"encoding": "mp3", "sample_rate": 44100, "channels": 1}
+MURF_STREAM_SAMPLE_RATES = (8000, 24000, 44100, 48000)
+PCM_SAMPLE_RATES = (16000, 24000)
+OPUS_SAMPLE_RATES = (16000, 24000, 48000)
+OPUS_FRAME_MS = 20
+
+
+def negotiate_output_format(requested: dict | None) -> dict:
+    """Resolves the client's requested output format to one this server can deliver."""
+    requested = requested or {}
+    encoding = str(requested.get("encoding", "mp3")).lower()
+    sample_rate = requested.get("sample_rate")
+
+    if encoding == "opus" and opuslib is None:
+        logging.warning("Opus output requested but opuslib is not installed; falling back to PCM16.")
+        encoding = "pcm16"
+    if encoding == "opus":
+        rate = sample_rate if sample_rate in OPUS_SAMPLE_RATES else 24000
+    elif encoding == "pcm16":
+        rate = sample_rate if sample_rate in PCM_SAMPLE_RATES else 24000
+    else:
+        return dict(DEFAULT_OUTPUT_FORMAT)
+    return {"encoding": encoding, "sample_rate": rate, "channels": 1}
+
+
+def murf_stream_params(output_format: dict) -> str:
+    """Returns the Murf stream-input query parameters for a negotiated output format."""
+    if output_format["encoding"] == "mp3":
+        return f"sample_rate={output_format['sample_rate']}&channel_type=MONO&format=MP3"
+    rate = output_format["sample_rate"]
+    murf_rate = rate if rate in MURF_STREAM_SAMPLE_RATES else 24000
+    return f"sample_rate={murf_rate}&channel_type=MONO&format=PCM"
+
+
+class PcmResampler:
+    """Streaming PCM16 resampler: windowed-sinc low-pass followed by linear interpolation."""
+
+    def __init__(self, src_rate: int, dst_rate: int, taps: int = 63):
+        self.step = src_rate / dst_rate
+        cutoff = min(1.0, dst_rate / src_rate) * 0.9
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = cutoff * np.sinc(cutoff * n) * np.hamming(taps)
+        self.kernel = (kernel / kernel.sum()).astype(np.float32)
+        self.history = np.zeros(taps - 1, dtype=np.float32)
+        self.last_sample = np.zeros(1, dtype=np.float32)
+        self.position = 0.0
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        if not samples.size:
+            return b""
+        buffered = np.concatenate((self.history, samples))
+        self.history = buffered[-(self.kernel.size - 1):]
+        filtered = np.concatenate((self.last_sample, np.convolve(buffered, self.kernel, mode="valid")))
+        positions = np.arange(self.position, filtered.size - 1, self.step)
+        self.position = (positions[-1] + self.step if positions.size else self.position) - (filtered.size - 1)
+        self.last_sample = filtered[-1:]
+        out = np.interp(positions, np.arange(filtered.size), filtered)
+        return np.clip(out, -32768, 32767).astype("<i2").tobytes()
+
+
+class TtsTranscoder:
+    """Turns the raw audio Murf streams into the client's negotiated output format."""
+
+    def __init__(self, output_format: dict):
+        self.output_format = output_format
+        self.passthrough = output_format["encoding"] == "mp3"
+        self.odd_byte = b""
+        self.pending = b""
+        self.header_checked = False
+        self.resampler = None
+        self.encoder = None
+        if self.passthrough:
+            return
+        rate = output_format["sample_rate"]
+        murf_rate = rate if rate in MURF_STREAM_SAMPLE_RATES else 24000
+        if murf_rate != rate:
+            self.resampler = PcmResampler(murf_rate, rate)
+        if output_format["encoding"] == "opus":
+            self.encoder = opuslib.Encoder(rate, 1, opuslib.APPLICATION_VOIP)
+            self.frame_bytes = rate * OPUS_FRAME_MS // 1000 * 2
+
+    def feed(self, audio: bytes) -> list[bytes]:
+        """Consumes one Murf audio chunk and returns zero or more output payloads."""
+        if self.passthrough:
+            return [audio]
+        if not self.header_checked:
+            self.header_checked = True
+            if audio[:4] == b"RIFF":  # Some PCM streams open with a WAV header.
+                audio = audio[44:]
+        data = self.odd_byte + audio
+        usable = len(data) - len(data) % 2
+        pcm, self.odd_byte = data[:usable], data[usable:]
+        if self.resampler:
+            pcm = self.resampler.process(pcm)
+        if self.encoder is None:
+            return [pcm] if pcm else []
+        return self._encode_opus(pcm)
+
+    def flush(self) -> list[bytes]:
+        """Emits whatever is still buffered at the end of a reply."""
+        self.odd_byte = b""
+        if self.encoder is None or not self.pending:
+            return []
+        tail = self.pending + b"\x00" * (self.frame_bytes - len(self.pending))
+        self.pending = b""
+        return [self.encoder.encode(tail, self.frame_bytes // 2)]
+
+    def _encode_opus(self, pcm: bytes) -> list[bytes]:
+        # `pending` holds the PCM samples still short of a whole 20 ms frame.
+        data = self.pending + pcm
+        packets = []
+        offset = 0
+        while offset + self.frame_bytes <= len(data):
+            packets.append(self.encoder.encode(data[offset:offset + self.frame_bytes], self.frame_bytes // 2))
+            offset += self.frame_bytes
+        self.pending = data[offset:]
+        return packets
@@ -0,0 +1,169 @@
+"""Benchmark: session throughput and setup latency with 1, 2, 4 and 8 worker processes.
+
+Starts the local AssemblyAI, Gemini and Murf stand-ins from bench_stt_sessions.py,
+then for each worker count launches that many workers (cluster.py) and drives full
+/ws sessions at a fixed concurrency: config message, the parallel handshake (STT
+connect, key checks, first Murf connection), speech-like audio streamed in real
+time (a quiet lead-in, then syllable-modulated voicing), and an explicit end. The
+STT stand-in counts the audio that got past each worker's VAD gate; a run in which
+none did is reported as a failure, since it would not have exercised STT. Before
+each level one handshake with a rejected key is made, and the bench fails if that
+session is left parked for a resume instead of being closed. Sessions are sent straight to the worker their id hashes to,
+the way a hashing balancer in front of the cluster would, so the load generator
+measures the workers rather than the Python router. Run it on a machine with at
+least as many cores as the largest worker count, plus one for the load generator.
+
+    python bench_cluster.py --workers 1 2 4 8 --sessions 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import List
+
+import aiohttp
+import numpy as np
+
+import cluster
+from bench_stt_sessions import FRAME_BYTES, FRAME_SECONDS, REJECTED_KEY, raise_fd_limit, run_fake_server
+
+BENCH_KEYS = {"gemini": "bench", "assemblyai": "bench", "murf": "bench"}
+SAMPLE_RATE = 16000
+LEAD_IN_FRAMES = 25  # Half a second of room noise before the user starts talking.
+
+
+def speech_like_frames(count: int) -> List[bytes]:
+    """`count` 20 ms PCM16 frames: quiet room noise, then a voiced burst (a 140 Hz
+    fundamental with harmonics) whose loudness rises and falls with ~4 syllables a second."""
+    rng = np.random.default_rng(0)
+    t = np.arange(count * FRAME_BYTES // 2) / SAMPLE_RATE
+    voicing = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+    syllables = 0.15 + 0.85 * np.abs(np.sin(2 * np.pi * 2 * t))
+    lead_in = min(LEAD_IN_FRAMES, count // 4) * FRAME_BYTES // 2
+    audio = rng.normal(0, 60, t.size)
+    audio[lead_in:] += 5000 * syllables[lead_in:] * voicing[lead_in:]
+    pcm = np.clip(audio, -32768, 32767).astype("<i2").tobytes()
+    return [pcm[i:i + FRAME_BYTES] for i in range(0, len(pcm), FRAME_BYTES)]
+
+
+async def run_session(http: aiohttp.ClientSession, workers, frames: List[bytes]) -> float:
+    session_id = uuid.uuid4().hex
+    url = cluster.worker_for(session_id, workers).replace("http", "ws", 1) + f"/ws?session={session_id}"
+    started = time.perf_counter()
+    async with http.ws_connect(url) as ws:
+        await ws.send_str(json.dumps({"type": "config", "keys": BENCH_KEYS, "session_id": session_id}))
+        async for message in ws:
+            data = json.loads(message.data)
+            if data.get("type") == "error":
+                raise RuntimeError(data.get("message"))
+            if data.get("type") == "status":  # "Connected!": the session is ready for audio.
+                break
+        ready = time.perf_counter() - started
+        for frame in frames:  # Paced like a microphone, so the worker's gate sees live audio.
+            await ws.send_bytes(frame)
+            await asyncio.sleep(FRAME_SECONDS)
+        await ws.send_str(json.dumps({"type": "end"}))
+    return ready
+
+
+async def check_rejected_handshake(workers):
+    """A session whose key is refused must be closed by the worker, not parked."""
+    session_id = uuid.uuid4().hex
+    worker = cluster.worker_for(session_id, workers)
+    async with aiohttp.ClientSession() as http:
+        async with http.ws_connect(worker.replace("http", "ws", 1) + f"/ws?session={session_id}") as ws:
+            await ws.send_str(json.dumps({"type": "config", "keys": {**BENCH_KEYS, "murf": REJECTED_KEY}, "session_id": session_id}))
+            replies = [json.loads(message.data) async for message in ws if message.type == aiohttp.WSMsgType.TEXT]
+        await asyncio.sleep(0.5)  # Past the worker's own handling of the close.
+        async with http.get(f"{worker}/sessions/stats") as response:
+            parked = (await response.json())["parked_sessions"]
+    if not any(reply.get("type") == "error" for reply in replies) or parked:
+        raise SystemExit(f"A rejected handshake was not closed cleanly: {parked} parked session(s), replies {replies}")
+
+
+async def stt_audio_seconds(http: aiohttp.ClientSession, stt_port: int) -> float:
+    async with http.get(f"http://127.0.0.1:{stt_port}/bench/stats") as response:
+        return (await response.json())["audio_bytes"] / (SAMPLE_RATE * 2)
+
+
+async def run_level(workers, sessions: int, concurrency: int, frames: int, stt_port: int) -> dict:
+    audio = speech_like_frames(frames)
+    limit = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(http):
+        nonlocal failures
+        async with limit:
+            try:
+                latencies.append(await run_session(http, workers, audio))
+            except (aiohttp.ClientError, RuntimeError, asyncio.TimeoutError):
+                failures += 1
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as http:
+        stt_before = await stt_audio_seconds(http, stt_port)
+        wall_start = time.monotonic()
+        await asyncio.gather(*(one(http) for _ in range(sessions)))
+        wall = time.monotonic() - wall_start
+        await asyncio.sleep(1.0)  # Lets the workers finish passing the last frames on to STT.
+        stt_seconds = await stt_audio_seconds(http, stt_port) - stt_before
+    latencies.sort()
+    return {
+        "workers": len(workers),
+        "sessions": sessions,
+        "failed": failures,
+        "sessions_per_s": round(len(latencies) / wall, 1),
+        "setup_p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "setup_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None,
+        "audio_sent_s": round(len(latencies) * frames * FRAME_SECONDS, 1),
+        "audio_to_stt_s": round(stt_seconds, 1),
+    }
+
+
+def main(levels, sessions: int, concurrency: int, frames: int, stt_port: int, worker_port: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            "ASSEMBLYAI_STREAM_URL": f"ws://127.0.0.1:{stt_port}/v3/ws",
+            "GEMINI_MODEL_URL": f"http://127.0.0.1:{stt_port}/v1beta/models/gemini-1.5-flash",
+            "MURF_VOICES_URL": f"http://127.0.0.1:{stt_port}/v1/speech/voices",
+            "MURF_STREAM_URL": f"ws://127.0.0.1:{stt_port}/v1/speech/stream-input",
+            "STT_POOL_SIZE": "0",
+            "RESUME_GRACE_SECONDS": "30",  # Sessions end explicitly, so only a failed one could be parked.
+            "SESSION_DB_PATH": os.path.join(tmp, "sessions.db"),
+        }
+        for count in levels:
+            processes = cluster.start_workers(count, worker_port, env=env)
+            try:
+                workers = cluster.worker_urls(count, worker_port)
+                cluster.wait_until_ready(workers)
+                asyncio.run(check_rejected_handshake(workers))
+                result = asyncio.run(run_level(workers, sessions, concurrency, frames, stt_port))
+                print(json.dumps(result))
+                if not result["audio_to_stt_s"]:
+                    raise SystemExit(f"No audio got past the VAD gate with {count} worker(s); this run did not load STT.")
+            finally:
+                cluster.stop_workers(processes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=50, help="20 ms audio frames sent per session, in real time.")
+    parser.add_argument("--stt-port", type=int, default=8765)
+    parser.add_argument("--worker-port", type=int, default=8100)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    server = multiprocessing.Process(target=run_fake_server, args=(args.stt_port,), daemon=True)
+    server.start()
+    time.sleep(1.0)
+    try:
+        main(args.workers, args.sessions, args.concurrency, args.frames, args.stt_port, args.worker_port)
+    finally:
+        server.terminate()
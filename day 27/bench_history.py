@@ -0,0 +1,119 @@
+"""Benchmark: memory and serialization cost of a 100-turn chat history.
+
+Compares the previous representation (an append-only list of Gemini-style dicts,
+passed to start_chat as is and measured by the store with one json.dumps per
+reply) against compact Turn records, over a session of `--turns` replies. When the
+Gemini SDK is installed, start_chat really runs (it converts the history to SDK
+Content objects without sending a request) and SDK Content memory is measured too.
+
+    python bench_history.py --turns 100
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from turns import Turn, to_wire_history
+
+USER_TEXT = "What's the weather like in London today, and should I pack an umbrella? " * 3
+MODEL_TEXT = "The winds whisper to me, adventurer. In London it is sunny and 22 degrees Celsius. " * 3
+
+
+def dict_exchange(index: int) -> list:
+    """One reply's messages as the previous code stored them: Gemini-style dicts."""
+    messages = []
+    if index % 10 == 5:
+        messages.append({"role": "model", "parts": [{"function_call": {"name": "get_weather", "args": {"city": "London"}}}]})
+        messages.append({"role": "user", "parts": [{"function_response": {"name": "get_weather", "response": {"result": "Sunny, 22C"}}}]})
+    messages.append({"role": "user", "parts": [f"{USER_TEXT}{index}"]})
+    messages.append({"role": "model", "parts": [f"{MODEL_TEXT}{index}"]})
+    return messages
+
+
+def turn_exchange(index: int) -> list:
+    messages = []
+    if index % 10 == 5:
+        messages.append(Turn.tool_call("get_weather", {"city": "London"}))
+        messages.append(Turn.tool_response("get_weather", "Sunny, 22C"))
+    messages.append(Turn.user(f"{USER_TEXT}{index}"))
+    messages.append(Turn.model(f"{MODEL_TEXT}{index}"))
+    return messages
+
+
+def build_dicts(turns: int) -> list:
+    return [message for index in range(turns) for message in dict_exchange(index)]
+
+
+def build_turns(turns: int) -> list:
+    return [turn for index in range(turns) for turn in turn_exchange(index)]
+
+
+def build_sdk_contents(turns: int):
+    from google.generativeai.types import content_types
+    return content_types.to_contents(build_dicts(turns))
+
+
+def measure_memory(build, turns: int) -> int:
+    tracemalloc.start()
+    history = build(turns)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    return size
+
+
+def chat_starter():
+    """model.start_chat when the Gemini SDK is installed (no request is sent), else a no-op."""
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        return lambda history: history
+    model = genai.GenerativeModel("gemini-1.5-flash")
+    return lambda history: model.start_chat(history=history)
+
+
+def session_cost_dicts(turns: int, start_chat) -> float:
+    """Per-reply work of the previous path: the append-only dict list goes to start_chat
+    as it is, and the store measures it with one json.dumps when the reply is stored."""
+    start = time.perf_counter()
+    history = []
+    for index in range(turns):
+        start_chat(history)
+        history.extend(dict_exchange(index))
+        len(json.dumps(history, ensure_ascii=False).encode("utf-8"))
+    return time.perf_counter() - start
+
+
+def session_cost_turns(turns: int, start_chat) -> float:
+    """Per-reply work with Turn records: build the wire history for start_chat, then
+    store the reply, summing the turns' cached sizes."""
+    start = time.perf_counter()
+    history = []
+    for index in range(turns):
+        start_chat(to_wire_history(history))
+        history.extend(turn_exchange(index))
+        sum(turn.nbytes for turn in history)
+    return time.perf_counter() - start
+
+
+def main(turns: int):
+    results = {
+        "turns": turns,
+        "dict_bytes": measure_memory(build_dicts, turns),
+        "turn_bytes": measure_memory(build_turns, turns),
+    }
+    start_chat = chat_starter()
+    results["dict_session_ms"] = round(session_cost_dicts(turns, start_chat) * 1000, 2)
+    results["turn_session_ms"] = round(session_cost_turns(turns, start_chat) * 1000, 2)
+    try:
+        results["sdk_content_bytes"] = measure_memory(build_sdk_contents, turns)
+    except ImportError:
+        pass
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+    main(args.turns)
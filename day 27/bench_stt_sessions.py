@@ -0,0 +1,135 @@
+"""Benchmark: how many concurrent STT sessions one process and one core can carry.
+
+Runs a local stand-in for the AssemblyAI v3 streaming endpoint in a child process,
+then opens N AsyncStreamingClient sessions that each stream real-time 20 ms PCM16
+frames. Reports thread count, CPU use and the resulting sessions per core.
+
+    python bench_stt_sessions.py --sessions 100 500 1000 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import threading
+import time
+
+from aiohttp import web
+
+import stt_client
+
+FRAME_BYTES = 640  # 20 ms of 16 kHz PCM16
+FRAME_SECONDS = 0.02
+REJECTED_KEY = "rejected"  # The key checks below refuse this one, to exercise a failed handshake.
+
+
+def run_fake_server(port: int):
+    received = {"audio_bytes": 0}  # Everything the clients streamed, i.e. what got past their VAD.
+
+    async def stream(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({"type": "Begin", "id": "bench", "expires_at": 0}))
+        frames = 0
+        async for msg in ws:
+            if msg.type == web.WSMsgType.BINARY:
+                frames += 1
+                received["audio_bytes"] += len(msg.data)
+                if frames % 25 == 0:  # A partial every half second, like a live speaker.
+                    await ws.send_str(json.dumps({"type": "Turn", "transcript": "hello there", "turn_order": 0,
+                                                  "end_of_turn": False, "turn_is_formatted": False, "words": []}))
+            elif msg.type == web.WSMsgType.TEXT and json.loads(msg.data).get("type") == "Terminate":
+                await ws.send_str(json.dumps({"type": "Termination", "audio_duration_seconds": frames * FRAME_SECONDS}))
+                break
+        await ws.close()
+        return ws
+
+    # Stand-ins for the rest of the /ws handshake, used by bench_cluster.py.
+    async def key_check(request):
+        if REJECTED_KEY in (request.headers.get("api-key"), request.headers.get("x-goog-api-key")):
+            return web.json_response({"error": "invalid key"}, status=401)
+        return web.json_response({})
+
+    async def stats(request):
+        return web.json_response(received)
+
+    async def murf_stream(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for _ in ws:
+            pass
+        return ws
+
+    raise_fd_limit()
+    app = web.Application()
+    app.router.add_get("/v3/ws", stream)
+    app.router.add_get("/v1beta/models/{model}", key_check)
+    app.router.add_get("/v1/speech/voices", key_check)
+    app.router.add_get("/v1/speech/stream-input", murf_stream)
+    app.router.add_get("/bench/stats", stats)
+    web.run_app(app, port=port, print=None)
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def run_session(url: str, seconds: float, counters: dict):
+    client = stt_client.AsyncStreamingClient(api_key="bench", url=url)
+    client.on(stt_client.StreamingEvents.Turn, lambda event: counters.__setitem__("turns", counters["turns"] + 1))
+    await client.connect()
+    frame = bytes(FRAME_BYTES)
+    deadline = time.monotonic() + seconds
+    next_send = time.monotonic()
+    while next_send < deadline:
+        client.stream(frame)
+        next_send += FRAME_SECONDS
+        await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+    counters["dropped"] += client.dropped_frames
+    await client.disconnect()
+
+
+async def run_level(url: str, sessions: int, seconds: float) -> dict:
+    counters = {"turns": 0, "dropped": 0}
+    peak_threads = threading.active_count()
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    tasks = [asyncio.create_task(run_session(url, seconds, counters)) for _ in range(sessions)]
+    while not all(task.done() for task in tasks):
+        peak_threads = max(peak_threads, threading.active_count())
+        await asyncio.sleep(0.5)
+    await asyncio.gather(*tasks)
+    cpu, wall = time.process_time() - cpu_start, time.monotonic() - wall_start
+    utilization = cpu / wall
+    return {
+        "sessions": sessions,
+        "peak_threads": peak_threads,
+        "cpu_utilization": round(utilization, 3),
+        "sessions_per_core": int(sessions / utilization) if utilization else None,
+        "partials_received": counters["turns"],
+        "frames_dropped": counters["dropped"],
+    }
+
+
+async def main(levels, seconds: float, port: int):
+    url = f"ws://127.0.0.1:{port}/v3/ws"
+    for sessions in levels:
+        print(json.dumps(await run_level(url, sessions, seconds)))
+    await stt_client.get_http_session().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    server = multiprocessing.Process(target=run_fake_server, args=(args.port,), daemon=True)
+    server.start()
+    time.sleep(1.0)
+    try:
+        asyncio.run(main(args.sessions, args.seconds, args.port))
+    finally:
+        server.terminate()
@@ -0,0 +1,105 @@
+"""Benchmark: turn-final latency under each end-of-turn policy, from recorded audio.
+
+Streams each 16 kHz mono PCM16 WAV file to AssemblyAI in real time, once per
+policy, followed by trailing silence so the turn can close. Latency is measured
+from the moment the last spoken word (per the STT word timings) was streamed to
+the moment the event that would start the LLM arrived, and separately to the
+formatted transcript.
+
+    python bench_turn_latency.py recordings/*.wav --runs 3
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import wave
+
+import config
+import stt_client
+from turn_policy import TurnPolicy
+
+FRAME_MS = 50
+TRAILING_SILENCE_S = 4.0
+POLICIES = {
+    "formatted": TurnPolicy(mode="formatted"),
+    "early": TurnPolicy(mode="early"),
+    "unformatted": TurnPolicy(mode="unformatted"),
+    "early_fast": TurnPolicy(mode="early", end_of_turn_confidence_threshold=0.5,
+                             min_end_of_turn_silence_when_confident=100, max_turn_silence=1200),
+}
+
+
+def load_pcm(path: str) -> bytes:
+    with wave.open(path, "rb") as wav:
+        if wav.getframerate() != 16000 or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise SystemExit(f"{path}: expected 16 kHz mono PCM16 audio.")
+        return wav.readframes(wav.getnframes())
+
+
+async def measure(pcm: bytes, policy: TurnPolicy) -> dict:
+    client = stt_client.AsyncStreamingClient(api_key=config.ASSEMBLYAI_API_KEY, format_turns=policy.format_turns,
+                                             extra_params=policy.stream_params())
+    stream_start = None
+    result = {"respond_ms": None, "formatted_ms": None}
+    done = asyncio.Event()
+
+    def on_turn(event: stt_client.TurnEvent):
+        if not (event.end_of_turn and event.words):
+            return
+        now = time.monotonic()
+        spoken_end = stream_start + event.words[-1].end / 1000
+        if result["respond_ms"] is None and policy.should_respond(event.end_of_turn, event.turn_is_formatted):
+            result["respond_ms"] = round((now - spoken_end) * 1000)
+        if event.turn_is_formatted and result["formatted_ms"] is None:
+            result["formatted_ms"] = round((now - spoken_end) * 1000)
+        if result["respond_ms"] is not None and (result["formatted_ms"] is not None or not policy.format_turns):
+            done.set()
+
+    client.on(stt_client.StreamingEvents.Turn, on_turn)
+    await client.connect()
+    frame_bytes = 16000 * 2 * FRAME_MS // 1000
+    audio = pcm + bytes(int(16000 * 2 * TRAILING_SILENCE_S))
+    stream_start = time.monotonic()
+    for index, offset in enumerate(range(0, len(audio), frame_bytes)):
+        await client.send(audio[offset:offset + frame_bytes])
+        await asyncio.sleep(max(0.0, stream_start + (index + 1) * FRAME_MS / 1000 - time.monotonic()))
+        if done.is_set():
+            break
+    try:
+        await asyncio.wait_for(done.wait(), timeout=5.0)
+    except asyncio.TimeoutError:
+        pass
+    await client.disconnect()
+    return result
+
+
+async def main(paths, runs: int):
+    recordings = {path: load_pcm(path) for path in paths}
+    for name, policy in POLICIES.items():
+        respond, formatted = [], []
+        for pcm in recordings.values():
+            for _ in range(runs):
+                result = await measure(pcm, policy)
+                if result["respond_ms"] is not None:
+                    respond.append(result["respond_ms"])
+                if result["formatted_ms"] is not None:
+                    formatted.append(result["formatted_ms"])
+        print(json.dumps({
+            "policy": name,
+            "turns": len(respond),
+            "respond_median_ms": statistics.median(respond) if respond else None,
+            "respond_max_ms": max(respond) if respond else None,
+            "formatted_median_ms": statistics.median(formatted) if formatted else None,
+        }))
+    await stt_client.get_http_session().close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recordings", nargs="+", help="16 kHz mono PCM16 WAV files, one utterance each")
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+    if not config.ASSEMBLYAI_API_KEY:
+        raise SystemExit("ASSEMBLYAI_API_KEY is required.")
+    asyncio.run(main(args.recordings, args.runs))
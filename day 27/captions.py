@@ -0,0 +1,58 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+# --- Live Partial Captions ---
+# STT sends a partial transcript for nearly every frame while the user speaks. The
+# browser only needs enough of them for the caption to feel live, so partials are
+# coalesced per session: at most one frame per interval, only when the text changed,
+# and a partial still pending when the interval ends is sent then (the newest one
+# wins). Ending a turn drops any pending partial so it can never land after the final.
+
+
+class CaptionCoalescer:
+    def __init__(self, send: Callable[[dict], Awaitable[None]], interval_ms: int):
+        self._send = send
+        self.interval = interval_ms / 1000
+        self._last_text: Optional[str] = None
+        self._last_sent_at = 0.0
+        self._pending: Optional[dict] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+
+    async def update(self, message: dict):
+        """Offers a partial caption frame; sends it now, later, or not at all."""
+        latest_text = self._pending["text"] if self._pending else self._last_text
+        if message["text"] == latest_text:
+            return
+        wait = self._last_sent_at + self.interval - time.monotonic()
+        if wait <= 0 and self._pending is None:
+            await self._emit(message)
+            return
+        if self._pending is not None:
+            self.coalesced += 1
+        self._pending = message
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after(wait))
+
+    async def _flush_after(self, delay: float):
+        await asyncio.sleep(max(0.0, delay))
+        message, self._pending = self._pending, None
+        if message:
+            await self._emit(message)
+
+    async def _emit(self, message: dict):
+        self._last_text = message["text"]
+        self._last_sent_at = time.monotonic()
+        self.sent += 1
+        await self._send(message)
+
+    def end_turn(self) -> bool:
+        """Discards any pending partial. Returns True if a caption for this turn was shown."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._pending = None
+        shown = self._last_text is not None
+        self._last_text = None
+        return shown
@@ -0,0 +1,150 @@
+"""Runs the voice bot as several worker processes behind a session-affine router.
+
+Each worker is a full uvicorn process with its own upstream pools (STT sessions,
+HTTP sessions) and its own parked sessions; nothing is shared between processes
+except chat histories, which go through the session journal (the SQLite file on one
+host, or Redis when SESSION_REDIS_URL is set). Any worker can therefore pick up any
+chat, but the router sends a session id to the same worker every time, so that
+worker normally has the history in memory already and a dropped socket can resume
+(parked sessions never leave their process). The browser puts its session id in the
+URL (`/ws?session=...`); requests without one are spread round-robin.
+
+    python cluster.py --workers 4 --port 8000
+
+The Python router is meant for development and single-host use. In production put
+any hashing L7 balancer in front of the workers instead, e.g. nginx:
+
+    upstream voicebot { hash $arg_session consistent; server 127.0.0.1:8100; server 127.0.0.1:8101; }
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length"}
+
+
+def worker_for(session_id: str, workers: List[str]) -> str:
+    """Rendezvous hashing: a session always maps to the same worker, and adding or
+    removing a worker only moves the sessions that belonged to it."""
+    return max(workers, key=lambda worker: hashlib.blake2b(f"{worker}|{session_id}".encode(), digest_size=8).digest())
+
+
+class Router:
+    def __init__(self, workers: List[str]):
+        self.workers = workers
+        self._round_robin = itertools.cycle(workers)
+        self.http: Optional[aiohttp.ClientSession] = None
+
+    def pick(self, request: web.Request) -> str:
+        session_id = request.query.get("session")
+        return worker_for(session_id, self.workers) if session_id else next(self._round_robin)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        worker = self.pick(request)
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await self._proxy_websocket(request, worker)
+        return await self._proxy_http(request, worker)
+
+    async def _proxy_http(self, request: web.Request, worker: str) -> web.Response:
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_HEADERS}
+        async with self.http.request(request.method, worker + request.rel_url.path_qs, headers=headers,
+                                     data=await request.read(), allow_redirects=False) as upstream:
+            body = await upstream.read()
+            response_headers = {name: value for name, value in upstream.headers.items() if name.lower() not in HOP_HEADERS}
+            return web.Response(status=upstream.status, body=body, headers=response_headers)
+
+    async def _proxy_websocket(self, request: web.Request, worker: str) -> web.WebSocketResponse:
+        client_ws = web.WebSocketResponse()
+        await client_ws.prepare(request)
+        async with self.http.ws_connect(worker.replace("http", "ws", 1) + request.rel_url.path_qs) as upstream:
+            async def relay(source, sink):
+                async for message in source:
+                    if message.type == aiohttp.WSMsgType.TEXT:
+                        await sink.send_str(message.data)
+                    elif message.type == aiohttp.WSMsgType.BINARY:
+                        await sink.send_bytes(message.data)
+                await sink.close()
+
+            await asyncio.gather(relay(client_ws, upstream), relay(upstream, client_ws))
+        return client_ws
+
+
+def build_router(workers: List[str]) -> web.Application:
+    router = Router(workers)
+
+    async def open_http(app):
+        # No decompression, so upstream bodies pass through with their own Content-Encoding.
+        router.http = aiohttp.ClientSession(auto_decompress=False)
+
+    async def close_http(app):
+        await router.http.close()
+
+    app = web.Application()
+    app.on_startup.append(open_http)
+    app.on_cleanup.append(close_http)
+    app.router.add_route("*", "/{tail:.*}", router.handle)
+    return app
+
+
+def start_workers(count: int, base_port: int, env: Optional[Dict[str, str]] = None) -> List[subprocess.Popen]:
+    """Starts `count` uvicorn workers on consecutive ports, each its own process with its own pools."""
+    return [
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(base_port + index)],
+                         cwd=APP_DIR, env={**os.environ, **(env or {})})
+        for index in range(count)
+    ]
+
+
+def wait_until_ready(workers: List[str], timeout: float = 60.0):
+    import requests
+    deadline = time.monotonic() + timeout
+    for worker in workers:
+        while True:
+            try:
+                requests.get(f"{worker}/sessions/stats", timeout=1).raise_for_status()
+                break
+            except requests.RequestException:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Worker {worker} did not come up within {timeout}s")
+                time.sleep(0.2)
+
+
+def stop_workers(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)  # Time for shutdown hooks to flush the session journal.
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def worker_urls(count: int, base_port: int) -> List[str]:
+    return [f"http://127.0.0.1:{base_port + index}" for index in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-port", type=int, default=8100, help="Port of the first worker; the others follow.")
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers, args.worker_port)
+    try:
+        workers = worker_urls(args.workers, args.worker_port)
+        wait_until_ready(workers)
+        web.run_app(build_router(workers), host=args.host, port=args.port)
+    finally:
+        stop_workers(processes)
@@ -7,4 +7,40 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
 MURF_API_KEY = os.getenv("MURF_API_KEY")
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
\ No newline at end of file
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+
+# End-of-turn policy defaults (see turn_policy.py); sessions may override them.
+TURN_POLICY_MODE = os.getenv("TURN_POLICY_MODE", "formatted")
+END_OF_TURN_CONFIDENCE_THRESHOLD = os.getenv("END_OF_TURN_CONFIDENCE_THRESHOLD")
+MIN_END_OF_TURN_SILENCE_WHEN_CONFIDENT = os.getenv("MIN_END_OF_TURN_SILENCE_WHEN_CONFIDENT")
+MAX_TURN_SILENCE = os.getenv("MAX_TURN_SILENCE")
+
+# Pre-connected STT sessions for the server's AssemblyAI key (see stt_pool.py); 0 disables the pool.
+STT_POOL_SIZE = int(os.getenv("STT_POOL_SIZE", "2"))
+STT_POOL_MAX_IDLE_S = float(os.getenv("STT_POOL_MAX_IDLE_S", "45"))
+
+# Live captions: at most one partial transcript frame per interval per session.
+CAPTION_INTERVAL_MS = int(os.getenv("CAPTION_INTERVAL_MS", "150"))
+
+# Chat session store limits (see session_store.py); SESSION_SPILL_DIR enables the disk tier.
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024)))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", str(2 * 3600)))
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR") or None
+
+# Write-behind persistence of chat sessions (see session_journal.py); an empty path disables it.
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_FLUSH_INTERVAL_MS = int(os.getenv("SESSION_FLUSH_INTERVAL_MS", "1000"))
+SESSION_FLUSH_BATCH = int(os.getenv("SESSION_FLUSH_BATCH", "256"))
+# Scale-out (see cluster.py): workers on one host share sessions through the SQLite
+# file above; set a Redis URL to share them across hosts instead (needs `pip install redis`).
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL") or None
+
+# How long a user-supplied key's check result is trusted (see credentials.py).
+CREDENTIAL_TTL_SECONDS = float(os.getenv("CREDENTIAL_TTL_SECONDS", "3600"))
+CREDENTIAL_INVALID_TTL_SECONDS = float(os.getenv("CREDENTIAL_INVALID_TTL_SECONDS", "60"))
+
+# A dropped browser socket parks its session this long for a resume (0 disables),
+# keeping at most this many outgoing messages for replay.
+RESUME_GRACE_SECONDS = float(os.getenv("RESUME_GRACE_SECONDS", "30"))
+RESUME_BACKLOG_MESSAGES = int(os.getenv("RESUME_BACKLOG_MESSAGES", "500"))
\ No newline at end of file
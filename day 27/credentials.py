@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+import config
+from stt_client import get_http_session
+
+# --- Validated-credential Cache ---
+# User-supplied keys are checked once at handshake instead of on the first turn, and
+# the result is remembered: valid keys for CREDENTIAL_TTL_SECONDS, rejected ones for
+# CREDENTIAL_INVALID_TTL_SECONDS, so a returning user skips validation entirely and
+# a bad key is refused before any audio is streamed. Entries are keyed by a keyed
+# BLAKE2 hash with a per-process salt, so raw keys are never used as cache keys.
+# The entry for a key also holds ready-made clients built for it (the Gemini model,
+# TavilyClient), shared by every session using that key. Checks are cheap authenticated GETs; when a
+# service cannot be reached the key is let through and checked again next time.
+GEMINI_MODEL_URL = os.getenv("GEMINI_MODEL_URL", "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash")
+MURF_VOICES_URL = os.getenv("MURF_VOICES_URL", "https://api.murf.ai/v1/speech/voices")
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=5)
+MAX_CACHED_KEYS = 1024
+INVALID_KEY_MESSAGES = {
+    "gemini": "Invalid or expired Gemini API Key. Please check your settings.",
+    "murf": "Invalid or expired Murf.ai API Key. Please check your settings.",
+}
+
+
+async def _probe(url: str, headers: Dict[str, str]) -> Optional[bool]:
+    """True/False for an accepted/rejected key; None when the answer is inconclusive."""
+    try:
+        async with get_http_session().get(url, headers=headers, timeout=PROBE_TIMEOUT) as response:
+            if response.status in (400, 401, 403):
+                return False
+            return True if response.status < 300 else None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.warning(f"Could not validate a key against {url}: {e}")
+        return None
+
+
+async def _check_gemini(key: str) -> Optional[bool]:
+    return await _probe(GEMINI_MODEL_URL, {"x-goog-api-key": key})
+
+
+async def _check_murf(key: str) -> Optional[bool]:
+    return await _probe(MURF_VOICES_URL, {"api-key": key})
+
+
+class _Credential:
+    __slots__ = ("valid", "checked_at", "clients")
+
+    def __init__(self, valid: bool):
+        self.valid = valid
+        self.checked_at = time.monotonic()
+        self.clients: Dict[str, Any] = {}
+
+
+class CredentialCache:
+    def __init__(self, ttl_s: float, invalid_ttl_s: float, max_keys: int = MAX_CACHED_KEYS):
+        self.ttl_s = ttl_s
+        self.invalid_ttl_s = invalid_ttl_s
+        self.max_keys = max_keys
+        self._salt = secrets.token_bytes(16)
+        self._entries: "OrderedDict[str, _Credential]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._validators: Dict[str, Callable[[str], Awaitable[Optional[bool]]]] = {"gemini": _check_gemini, "murf": _check_murf}
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, service: str, key: str) -> str:
+        return hashlib.blake2b(f"{service}:{key}".encode("utf-8"), key=self._salt, digest_size=16).hexdigest()
+
+    def _fresh(self, fingerprint: str) -> Optional[_Credential]:
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.checked_at > (self.ttl_s if entry.valid else self.invalid_ttl_s):
+            del self._entries[fingerprint]
+            return None
+        self._entries.move_to_end(fingerprint)
+        return entry
+
+    def _remember(self, fingerprint: str, valid: bool) -> _Credential:
+        entry = self._entries.get(fingerprint)
+        if entry is None or entry.valid != valid:
+            entry = self._entries[fingerprint] = _Credential(valid)
+        else:
+            entry.checked_at = time.monotonic()
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def is_valid(self, service: str, key: str) -> bool:
+        fingerprint = self.fingerprint(service, key)
+        entry = self._fresh(fingerprint)
+        if entry:
+            self.hits += 1
+            return entry.valid
+        self.misses += 1
+        pending = self._inflight.get(fingerprint)
+        if pending is None:
+            # Sessions opening with the same new key at once share a single check.
+            pending = self._inflight[fingerprint] = asyncio.ensure_future(self._validators[service](key))
+            pending.add_done_callback(lambda _: self._inflight.pop(fingerprint, None))
+        valid = await asyncio.shield(pending)
+        if valid is None:
+            return True
+        self._remember(fingerprint, valid)
+        return valid
+
+    async def invalid_services(self, keys: Dict[str, Optional[str]], services: Iterable[str]) -> List[str]:
+        """Checks the given services' keys concurrently; returns the services whose key was rejected."""
+        services = [service for service in services if keys.get(service) and service in self._validators]
+        results = await asyncio.gather(*(self.is_valid(service, keys[service]) for service in services))
+        return [service for service, valid in zip(services, results) if not valid]
+
+    def client(self, service: str, key: str, factory: Callable[[str], Any]) -> Any:
+        """A ready-made client for the key, built once and shared by every session using it."""
+        fingerprint = self.fingerprint(service, key)
+        entry = self._fresh(fingerprint) or self._remember(fingerprint, True)
+        if service not in entry.clients:
+            entry.clients[service] = factory(key)
+        return entry.clients[service]
+
+    def forget(self, service: str, key: str):
+        """Drops a key that a service has just rejected, so the next session checks it again."""
+        self._entries.pop(self.fingerprint(service, key), None)
+
+    def stats(self) -> dict:
+        return {"keys": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+credential_cache = CredentialCache(config.CREDENTIAL_TTL_SECONDS, config.CREDENTIAL_INVALID_TTL_SECONDS)
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+
+# --- Uplink Framing Ring Buffer ---
+# Browser chunks arrive in whatever size the client produced. They are copied into a
+# preallocated ring of fixed 50 ms PCM16 slots, so every later stage (VAD, STT) sees
+# uniform frames and nothing is allocated per chunk. The ring is also the bounded
+# queue between the WebSocket receive loop (which only ever calls write()) and the
+# task that sends frames upstream. When STT falls behind and the ring fills, the
+# overflow policy decides which audio to lose; the receive loop never waits.
+UPLINK_FRAME_MS = 50
+UPLINK_SLOTS = 40  # Two seconds of audio before the overflow policy kicks in.
+DROP_OLDEST = "drop_oldest"  # Keep latency bounded: lose the stalest audio first.
+DROP_NEWEST = "drop_newest"  # Keep what is queued intact: lose incoming audio instead.
+
+
+class FrameRing:
+    """Preallocated ring of fixed-size frames with a single producer and a single consumer."""
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = UPLINK_FRAME_MS, slots: int = UPLINK_SLOTS,
+                 policy: str = DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.frame_bytes = sample_rate * 2 * frame_ms // 1000
+        self.slots = slots
+        self.policy = policy
+        self._view = memoryview(bytearray(self.frame_bytes * slots))
+        self._out = memoryview(bytearray(self.frame_bytes))  # The frame currently handed to the consumer.
+        self._completed_at = [0.0] * slots
+        self.frame_completed_at = 0.0  # perf_counter() when the frame last returned by get_frame() arrived.
+        self._head = 0        # Slot of the oldest complete frame.
+        self._ready = 0       # Complete frames waiting to be sent.
+        self._fill = 0        # Bytes written into the slot being assembled.
+        self._frame_ready = asyncio.Event()
+        self.dropped_frames = 0
+        self.frames_written = 0
+        self._warned = False
+
+    def write(self, chunk: bytes):
+        """Copies a chunk of any size into the ring. Never blocks."""
+        data = memoryview(chunk)
+        offset = 0
+        while offset < len(data):
+            slot_start = ((self._head + self._ready) % self.slots) * self.frame_bytes
+            take = min(self.frame_bytes - self._fill, len(data) - offset)
+            self._view[slot_start + self._fill:slot_start + self._fill + take] = data[offset:offset + take]
+            self._fill += take
+            offset += take
+            if self._fill == self.frame_bytes:
+                self._commit()
+
+    def _commit(self):
+        self._completed_at[(self._head + self._ready) % self.slots] = time.perf_counter()
+        self._fill = 0
+        self.frames_written += 1
+        # One slot is always kept free for assembling the next frame.
+        if self._ready + 2 <= self.slots:
+            self._ready += 1
+        elif self.policy == DROP_OLDEST:
+            self._head = (self._head + 1) % self.slots
+            self.dropped_frames += 1
+        else:
+            self.dropped_frames += 1  # The just-completed slot is simply reassembled.
+        if not self._warned and self._ready >= self.slots * 3 // 4:
+            self._warned = True
+            logging.warning(f"Uplink ring is {self._ready}/{self.slots} full; STT is falling behind ({self.policy}).")
+        self._frame_ready.set()
+
+    async def get_frame(self) -> memoryview:
+        """Waits for the next complete frame. The view stays valid until the next get_frame() call."""
+        while not self._ready:
+            self._frame_ready.clear()
+            await self._frame_ready.wait()
+        slot_start = self._head * self.frame_bytes
+        self._out[:] = self._view[slot_start:slot_start + self.frame_bytes]
+        self.frame_completed_at = self._completed_at[self._head]
+        self._head = (self._head + 1) % self.slots
+        self._ready -= 1
+        if self._ready < self.slots // 2:
+            self._warned = False
+        return self._out
+
+    @property
+    def queued_frames(self) -> int:
+        return self._ready
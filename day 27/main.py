@@ -7,23 +7,41 @@ from fastapi.templating import Jinja2Templates
 from pathlib import Path as PathLib
 import json
 import asyncio
+import time
 import config 
+import phrases
+import audio_formats
 from typing import List, Dict
 import base64
 import websockets
 from datetime import datetime
 import re
 import ast
+import uuid
+import secrets
 import requests
 
 from tavily import TavilyClient
 import google.generativeai as genai
-import assemblyai as aai
-from assemblyai.streaming.v3 import StreamingClient, StreamingClientOptions, StreamingParameters, TurnEvent, StreamingEvents
+import google.ai.generativelanguage as glm
+from stt_client import AsyncStreamingClient, StreamingEvents, TurnEvent, ErrorEvent, SttStreamClosed
+from vad import VoiceActivityGate
+from ingest import FrameRing
+from turn_policy import DEPLOYMENT_TURN_POLICY, build_turn_policy
+from stt_pool import SttSessionPool
+from captions import CaptionCoalescer
+from session_store import session_store, keep_sessions_tidy
+from session_journal import open_session_journal
+from turns import Turn, to_wire_history
+from resume import ClientLink, ParkedSessions
+from credentials import credential_cache, INVALID_KEY_MESSAGES
+from murf_connections import MurfConnections, murf_stream_uri
 
 # --- Basic Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 app = FastAPI()
+stt_pool = None
+parked_sessions = ParkedSessions()
 
 # --- File Paths and Static/Template Configuration ---
 BASE_DIR = PathLib(__file__).resolve().parent
@@ -31,14 +49,21 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 # --- CORE LOGIC: GEMINI + TTS STREAMING ---
-async def get_llm_response_stream(transcript: str, client_websocket: WebSocket, chat_history: List[dict], active_config: Dict):
+def gemini_model_for(api_key: str) -> genai.GenerativeModel:
+    # genai.configure() sets one key for the whole process, so concurrent sessions with
+    # different keys would race on it. Each key gets its own model and transport instead.
+    model = genai.GenerativeModel('gemini-1.5-flash')
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    return model
+
+async def get_llm_response_stream(transcript: str, client_websocket: ClientLink, chat_history: List[Turn], active_config: Dict, output_format: Dict, murf_links: MurfConnections):
     # --- TOOL DEFINITIONS (Session Scoped) ---
     def tavily_search(query: str) -> str:
         api_key = active_config.get("tavily")
         if not api_key: return "Tavily API key is not configured for this session."
         try:
             logging.info(f"TOOL: tavily_search, QUERY: {query}")
-            client = TavilyClient(api_key=api_key)
+            client = credential_cache.client("tavily", api_key, lambda key: TavilyClient(api_key=key))
             response = client.search(query=query, search_depth="basic")
             return "\n".join([f"- {res['content']}" for res in response.get('results', [])]) or "No results found."
         # --- FINAL FIX: CATCH SPECIFIC API KEY ERRORS ---
@@ -76,35 +101,43 @@ async def get_llm_response_stream(transcript: str, client_websocket: WebSocket,
         except Exception as e:
             return f"Error retrieving weather information: {e}"
 
+    # The key was checked at handshake (see credentials.py), so no probe request here.
     try:
-        genai.configure(api_key=active_config.get("gemini"))
-        gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-        gemini_model.count_tokens("test") 
+        gemini_model = credential_cache.client("gemini", active_config.get("gemini"), gemini_model_for)
     except Exception as e:
         logging.error(f"Failed to configure or use Gemini: {e}")
-        await client_websocket.send_text(json.dumps({"type": "error", "message": "Invalid or expired Gemini API Key. Please check your settings."}))
+        credential_cache.forget("gemini", active_config.get("gemini"))
+        await client_websocket.send_text(json.dumps(phrases.with_phrase_audio({"type": "error", "message": "Invalid or expired Gemini API Key. Please check your settings."}, "gemini_key_invalid")))
         return
 
     logging.info(f"USER TRANSCRIPT: '{transcript}'")
     
     murf_api_key = active_config.get("murf")
-    murf_uri = f"wss://api.murf.ai/v1/speech/stream-input?api-key={murf_api_key}&sample_rate=44100&channel_type=MONO&format=MP3"
+    transcoder = audio_formats.TtsTranscoder(output_format)
 
     try:
-        async with websockets.connect(murf_uri) as websocket:
+        async with await murf_links.take() as websocket:
             voice_id = "en-US-natalie"
             logging.info(f"Connected to Murf AI using voice: {voice_id}")
             context_id = f"voice-agent-context-{datetime.now().isoformat()}"
             await websocket.send(json.dumps({"voice_config": {"voiceId": voice_id, "style": "Conversational"}, "context_id": context_id}))
 
+            async def forward_audio(payloads: List[bytes]):
+                for payload in payloads:
+                    await client_websocket.send_text(json.dumps({"type": "audio", "data": base64.b64encode(payload).decode("ascii")}))
+
             async def receive_and_forward_audio():
                 try:
                     while True:
                         response_str = await websocket.recv()
                         response = json.loads(response_str)
                         if "audio" in response and response['audio']:
-                            await client_websocket.send_text(json.dumps({"type": "audio", "data": response['audio']}))
+                            if transcoder.passthrough:
+                                await client_websocket.send_text(json.dumps({"type": "audio", "data": response['audio']}))
+                            else:
+                                await forward_audio(transcoder.feed(base64.b64decode(response['audio'])))
                         if response.get("final"):
+                            await forward_audio(transcoder.flush())
                             await client_websocket.send_text(json.dumps({"type": "audio_end"}))
                             break
                 except websockets.ConnectionClosed:
@@ -133,15 +166,18 @@ Your Tools (Spells):
 4.  **Handle Missing Tools:** If a user asks for something you don't have a spell for (e.g., sending an email), politely inform them that you lack that specific magic.
 5.  **Handle Transcription Errors:** If the user's quest seems to have a minor transcription error (e.g., 'plus' instead of 'place'), correct it to the most logical term before using a tool.
 """
-                chat_history.append({"role": "user", "parts": [prompt]})
-                chat = gemini_model.start_chat(history=chat_history[:-1])
+                # The exchange joins the session history only once the reply is complete, so a
+                # reply cancelled by barge-in leaves no orphaned turns behind, and overlapping
+                # replies each start from their own wire copy of the history.
+                exchange = [Turn.user(prompt)]
+                chat = gemini_model.start_chat(history=to_wire_history(chat_history))
                 loop = asyncio.get_running_loop()
                 response = await loop.run_in_executor(None, lambda: chat.send_message(prompt, tools=available_tools, tool_config={"function_calling_config": {"mode": "AUTO"}}))
                 function_call = next((part.function_call for part in response.candidates[0].content.parts if part.function_call), None)
 
                 if function_call:
                     function_name, function_args = function_call.name, {k: v for k, v in function_call.args.items()}
-                    await client_websocket.send_text(json.dumps({"type": "status", "message": f"Diva is casting {function_name}..."}))
+                    await client_websocket.send_text(json.dumps(phrases.with_phrase_audio({"type": "status", "message": f"Diva is casting {function_name}..."}, f"casting_{function_name}")))
                     tool_map = {"tavily_search": tavily_search, "calculate": calculate, "set_timer": set_timer, "get_weather": get_weather}
                     if function_name in tool_map:
                         function_result = await loop.run_in_executor(None, lambda: tool_map[function_name](**function_args))
@@ -151,10 +187,10 @@ Your Tools (Spells):
                             await client_websocket.send_text(json.dumps({"type": "start_timer", "duration_seconds": duration * 60 if 'minute' in units.lower() else duration}))
                     else:
                         function_result = "Unknown spell."
-                    chat_history.append(response.candidates[0].content)
-                    function_response_content = {"role": "user", "parts": [{"function_response": {"name": function_name, "response": {"result": function_result}}}]}
-                    chat_history.append(function_response_content)
-                    final_response_stream = await loop.run_in_executor(None, lambda: chat.send_message(function_response_content, stream=True))
+                    exchange.append(Turn.tool_call(function_name, function_args))
+                    function_response_turn = Turn.tool_response(function_name, function_result)
+                    exchange.append(function_response_turn)
+                    final_response_stream = await loop.run_in_executor(None, lambda: chat.send_message(function_response_turn.to_wire(), stream=True))
                 else:
                     final_response_stream = response
                 
@@ -175,24 +211,62 @@ Your Tools (Spells):
                     await websocket.send(json.dumps({"text": sentence_buffer.strip(), "end": True, "context_id": context_id}))
                 
                 logging.info(f"DIVA'S RESPONSE: {full_response_text}")
-                chat_history.append({"role": "model", "parts": [full_response_text]})
+                exchange.append(Turn.model(full_response_text))
+                chat_history.extend(exchange)
                 await asyncio.wait_for(receiver_task, timeout=60.0)
             except asyncio.TimeoutError:
                 logging.warning("Murf audio receiver timed out gracefully.")
             finally:
                 if not receiver_task.done(): receiver_task.cancel()
-    except websockets.exceptions.InvalidStatusCode:
+    except websockets.exceptions.InvalidHandshake:  # InvalidStatusCode, or InvalidStatus on websockets >= 14.
         logging.error("Failed to connect to Murf AI, likely due to an invalid API key.")
-        await send_client_message(client_websocket, {"type": "error", "message": "Invalid or expired Murf.ai API Key. Please check your settings."})
+        credential_cache.forget("murf", murf_api_key)
+        await send_client_message(client_websocket, phrases.with_phrase_audio({"type": "error", "message": "Invalid or expired Murf.ai API Key. Please check your settings."}, "murf_key_invalid"))
     except Exception as e:
         logging.error(f"Error in main streaming function: {e}", exc_info=True)
-        await send_client_message(client_websocket, {"type": "error", "message": "An unexpected error occurred."})
+        await send_client_message(client_websocket, phrases.with_phrase_audio({"type": "error", "message": "An unexpected error occurred."}, "unexpected_error"))
 
 # --- FastAPI Endpoints ---
+@app.on_event("startup")
+async def warm_system_phrases():
+    # Cached phrases load immediately; missing ones are voiced off the event loop
+    # so a Murf outage never delays startup.
+    phrases.load_phrases(synthesize=False)
+    asyncio.get_running_loop().run_in_executor(None, phrases.load_phrases)
+
+@app.on_event("startup")
+async def start_stt_pool():
+    global stt_pool
+    if config.ASSEMBLYAI_API_KEY and config.STT_POOL_SIZE > 0:
+        stt_pool = SttSessionPool(config.ASSEMBLYAI_API_KEY, size=config.STT_POOL_SIZE, max_idle_s=config.STT_POOL_MAX_IDLE_S,
+                                  sample_rate=16000, format_turns=DEPLOYMENT_TURN_POLICY.format_turns,
+                                  extra_params=DEPLOYMENT_TURN_POLICY.stream_params())
+        await stt_pool.start()
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    session_store.journal = open_session_journal()
+    asyncio.create_task(keep_sessions_tidy(session_store))
+
+@app.on_event("shutdown")
+async def flush_session_journal():
+    if session_store.journal:
+        await session_store.journal.aclose()
+
+@app.on_event("shutdown")
+async def close_stt_pool():
+    await parked_sessions.close()
+    if stt_pool:
+        await stt_pool.close()
+
 @app.get("/")
 async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/sessions/stats")
+async def session_stats():
+    return {"worker_pid": os.getpid(), "parked_sessions": len(parked_sessions), "credentials": credential_cache.stats(), **session_store.stats()}
+
 async def send_client_message(ws: WebSocket, message: dict):
     try:
         if ws.client_state.name == 'CONNECTED':
@@ -203,15 +277,47 @@ async def send_client_message(ws: WebSocket, message: dict):
 @app.websocket("/ws")
 async def websocket_audio_streaming(websocket: WebSocket):
     await websocket.accept()
-    main_loop = asyncio.get_running_loop()
     
     final_config = {}
     client = None
     llm_task = None
+    vad_gate = None
+    uplink = FrameRing(sample_rate=16000)
+    uplink_task = None
+    captions = None
+    murf_links = None
+    handshake_started = time.perf_counter()
+    link = ClientLink(websocket, backlog_limit=config.RESUME_BACKLOG_MESSAGES)
+    resume_token = None
+    client_ended = False
+    server_ended = False
+    handed_off = False
+
+    async def teardown():
+        if llm_task and not llm_task.done():
+            llm_task.cancel()
+        if uplink_task and uplink_task is not asyncio.current_task():
+            uplink_task.cancel()
+        if murf_links:
+            await murf_links.close()
+        if captions:
+            captions.end_turn()
+            logging.info(f"Live captions: {captions.sent} sent, {captions.coalesced} coalesced.")
+        if client:
+            await client.disconnect()
+        if vad_gate:
+            logging.info(f"VAD gate: {vad_gate.stats()}; uplink frames dropped: {uplink.dropped_frames}/{uplink.frames_written}")
+        logging.info("Cleaned up connection resources.")
     
     try:
         config_message_str = await asyncio.wait_for(websocket.receive_text(), timeout=10.0)
         config_message = json.loads(config_message_str)
+        resume_session = parked_sessions.claim(config_message.get("resume_token"))
+        if resume_session:
+            # A reconnect within the grace window: skip validation and STT setup entirely.
+            handed_off = True
+            await resume_session(websocket)
+            return
         if config_message.get("type") == "config":
             user_keys = config_message.get("keys", {})
             final_config = {
@@ -225,52 +331,214 @@ async def websocket_audio_streaming(websocket: WebSocket):
             missing_keys = [key for key in essential_keys if not final_config.get(key)]
             if missing_keys:
                 error_msg = f"Essential API key(s) missing: {', '.join(missing_keys)}. Please set them in the settings."
-                await send_client_message(websocket, {"type": "error", "message": error_msg})
+                await send_client_message(websocket, phrases.with_phrase_audio({"type": "error", "message": error_msg}, "keys_missing"))
                 raise ValueError(error_msg)
             
             logging.info("Essential keys are present. Final merged configuration created.")
+            output_format = audio_formats.negotiate_output_format(config_message.get("audio_format"))
+            await send_client_message(websocket, {"type": "audio_format", **output_format})
+            logging.info(f"Negotiated TTS output format: {output_format}")
+            try:
+                turn_policy = build_turn_policy(DEPLOYMENT_TURN_POLICY, config_message.get("turn_policy"))
+            except ValueError as e:
+                await send_client_message(websocket, {"type": "error", "message": str(e)})
+                raise
+            logging.info(f"Turn policy: {turn_policy}")
         else:
             raise ValueError("First message was not a configuration message.")
 
         aai_key = final_config.get("assemblyai")
-        client = StreamingClient(StreamingClientOptions(api_key=aai_key))
-        chat_history = []
-        last_processed_transcript = ""
+        stream_kwargs = {"sample_rate": 16000, "format_turns": turn_policy.format_turns, "extra_params": turn_policy.stream_params()}
+        if stt_pool and stt_pool.serves(aai_key, **stream_kwargs):
+            client = stt_pool.acquire()
+        if client:
+            logging.info("Using a pre-connected STT session from the pool.")
+        else:
+            client = AsyncStreamingClient(api_key=aai_key, **stream_kwargs)
+        vad_gate = VoiceActivityGate(sample_rate=16000, hangover_ms=turn_policy.vad_hangover_ms)
+        session_id = str(config_message.get("session_id") or uuid.uuid4().hex)[:64]
+        chat_history = await session_store.get(session_id)
+        responded_turn_order = None
+        client_playing = False
+        captions = CaptionCoalescer(lambda message: send_client_message(link, message), config.CAPTION_INTERVAL_MS)
+
+        async def barge_in(source: str, onset_at: float):
+            # Interrupt as soon as the user starts talking over Diva, instead of waiting
+            # for their finished turn: stop LLM + TTS here and playback in the browser.
+            # onset_at is when the triggering audio (or STT partial) reached the server.
+            nonlocal llm_task, client_playing
+            reply_active = llm_task is not None and not llm_task.done()
+            if not (reply_active or client_playing):
+                return
+            if reply_active:
+                llm_task.cancel()
+            client_playing = False
+            reaction_ms = round((time.perf_counter() - onset_at) * 1000, 1)
+            await send_client_message(link, {"type": "interrupt", "source": source, "reaction_ms": reaction_ms})
+            logging.info(f"Barge-in from {source}: interrupt sent {reaction_ms} ms after speech onset.")
 
-        def on_turn(self, event: TurnEvent):
-            nonlocal last_processed_transcript, llm_task
+        async def on_turn(event: TurnEvent):
+            nonlocal responded_turn_order, llm_task
             transcript_text = event.transcript.strip()
-            if event.end_of_turn and event.turn_is_formatted and transcript_text and transcript_text != last_processed_transcript:
-                last_processed_transcript = transcript_text
-                logging.info(f"Final formatted turn: '{transcript_text}'")
-                transcript_message = {"type": "transcription", "text": transcript_text, "end_of_turn": True}
-                asyncio.run_coroutine_threadsafe(send_client_message(websocket, transcript_message), main_loop)
+            if transcript_text and not event.end_of_turn:
+                await barge_in("stt_partial", time.perf_counter())
+                await captions.update({
+                    "type": "transcription", "text": transcript_text, "end_of_turn": False, "turn_order": event.turn_order,
+                    "words": [{"text": word.text, "start": word.start, "end": word.end, "final": word.word_is_final} for word in event.words],
+                })
+                return
+            if not event.end_of_turn:
+                return
+            caption_shown = captions.end_turn()
+            if not transcript_text:
+                if caption_shown:
+                    # The turn ended without text (e.g. noise); let the browser drop its live caption.
+                    await send_client_message(link, {"type": "transcription", "text": "", "end_of_turn": True, "turn_order": event.turn_order})
+                return
+            transcript_message = {"type": "transcription", "text": transcript_text, "end_of_turn": True, "turn_order": event.turn_order}
+            if event.turn_order != responded_turn_order and turn_policy.should_respond(event.end_of_turn, event.turn_is_formatted):
+                responded_turn_order = event.turn_order
+                logging.info(f"End of turn {event.turn_order} ({turn_policy.mode}, confidence {event.end_of_turn_confidence:.2f}): '{transcript_text}'")
+                await send_client_message(link, transcript_message)
                 if llm_task and not llm_task.done(): llm_task.cancel()
-                llm_task = asyncio.run_coroutine_threadsafe(get_llm_response_stream(transcript_text, websocket, chat_history, final_config), main_loop)
-        
+                llm_task = asyncio.create_task(get_llm_response_stream(transcript_text, link, chat_history, final_config, output_format, murf_links))
+                llm_task.add_done_callback(lambda task: task.cancelled() or session_store.put(session_id, chat_history))
+            elif event.turn_is_formatted and event.turn_order == responded_turn_order:
+                # Early mode: the LLM already has the raw text; only the display gets the formatted version.
+                await send_client_message(link, {**transcript_message, "replaces_turn": True})
+
+        async def on_error(event: ErrorEvent):
+            logging.error(f"AssemblyAI streaming error: {event.message}")
+            if event.fatal:
+                await send_client_message(link, phrases.with_phrase_audio({"type": "error", "message": "Lost the connection to the transcription service."}, "unexpected_error"))
+
         client.on(StreamingEvents.Turn, on_turn)
-        client.connect(StreamingParameters(sample_rate=16000, format_turns=True))
-        await send_client_message(websocket, {"type": "status", "message": "Connected! Ready for adventure!"})
-        
-        while True:
-            message = await websocket.receive()
-            if "bytes" in message and message['bytes']:
-                client.stream(message['bytes'])
-            elif "text" in message and json.loads(message['text']).get("type") == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+        client.on(StreamingEvents.Error, on_error)
+        murf_links = MurfConnections(murf_stream_uri(final_config["murf"], output_format))
+
+        async def bootstrap() -> bool:
+            # Everything the first reply needs, at once rather than in series: the STT
+            # stream (unless pooled), the Gemini and Murf key checks (see credentials.py)
+            # and the session's first Murf connection. "Connected!" waits for all of it.
+            nonlocal resume_token
+            timings = {}
+
+            async def timed(name: str, awaitable):
+                started = time.perf_counter()
+                try:
+                    return await awaitable
+                finally:
+                    timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+            stt_result, invalid_keys, murf_result = await asyncio.gather(
+                timed("stt", client.connect()) if not client.is_open else asyncio.sleep(0),
+                timed("keys", credential_cache.invalid_services(final_config, INVALID_KEY_MESSAGES)),
+                timed("murf", murf_links.prepare()),
+                return_exceptions=True,
+            )
+            if isinstance(stt_result, BaseException):
+                logging.error(f"Could not connect to AssemblyAI: {stt_result}")
+                await send_client_message(link, phrases.with_phrase_audio({"type": "error", "message": "Could not reach the transcription service."}, "unexpected_error"))
+                return False
+            if isinstance(invalid_keys, BaseException):
+                logging.warning(f"Could not check API keys at handshake: {invalid_keys}")
+            elif invalid_keys:
+                logging.error(f"Rejected API key(s): {', '.join(invalid_keys)}")
+                await send_client_message(link, phrases.with_phrase_audio({"type": "error", "message": INVALID_KEY_MESSAGES[invalid_keys[0]]}, f"{invalid_keys[0]}_key_invalid"))
+                return False
+            if isinstance(murf_result, BaseException):
+                logging.warning(f"Could not pre-open a Murf connection; the first reply will connect itself: {murf_result}")
+            handshake_ms = round((time.perf_counter() - handshake_started) * 1000, 1)
+            logging.info(f"Session ready {handshake_ms} ms after accept (parallel steps, ms: {timings}).")
+            # Only a session that is up can be resumed, so the token comes with "Connected!".
+            resume_token = secrets.token_urlsafe(16)
+            await send_client_message(link, {"type": "session", "resume_token": resume_token, "grace_seconds": config.RESUME_GRACE_SECONDS})
+            await send_client_message(link, {"type": "status", "message": "Connected! Ready for adventure!", "handshake_ms": handshake_ms})
+            return True
+
+        async def end_session():
+            # The server is closing the session (failed handshake, lost STT): clean up
+            # now, and mark it so that serve() does not park it for a resume.
+            nonlocal server_ended
+            server_ended = True
+            await teardown()
+            await link.close()
+
+        async def pump_uplink():
+            # Drains fixed 50 ms frames from the ring through the VAD gate to STT.
+            # A slow upstream only backs up the ring, never the receive loop below,
+            # which starts buffering the user's first words while bootstrap() runs.
+            if not await bootstrap():
+                await end_session()
+                return
+            try:
+                while True:
+                    frame = await uplink.get_frame()
+                    gate_result = vad_gate.process(frame)
+                    if gate_result.speech_started:
+                        await barge_in("vad", uplink.frame_completed_at)
+                    for gated_frame in gate_result.frames:
+                        await client.send(gated_frame)
+                    if gate_result.speech_ended:
+                        await client.force_endpoint()
+            except SttStreamClosed as e:
+                # on_error has already told the browser; end the session rather than idle without STT.
+                logging.error(f"Ending session: {e}")
+                await end_session()
+
+        uplink_task = asyncio.create_task(pump_uplink())
+
+        async def serve(ws: WebSocket, resumed: bool = False):
+            # Feeds the session from one browser socket. When that socket drops, the
+            # session is parked for a reconnect instead of torn down (see resume.py).
+            nonlocal client_playing, client_ended
+            if resumed:
+                replayed = await link.attach(ws)
+                await send_client_message(link, {"type": "resumed", "replayed": replayed, "dropped": link.dropped_messages})
+                logging.info(f"Session {resume_token[:8]} resumed; replayed {replayed} message(s).")
+            try:
+                while True:
+                    message = await ws.receive()
+                    if message.get("type") == "websocket.disconnect":
+                        raise WebSocketDisconnect(message.get("code", 1000))
+                    if "bytes" in message and message['bytes']:
+                        uplink.write(message['bytes'])
+                    elif "text" in message:
+                        control = json.loads(message['text'])
+                        if control.get("type") == "ping":
+                            await ws.send_text(json.dumps({"type": "pong"}))
+                        elif control.get("type") == "playback":
+                            client_playing = bool(control.get("active"))
+                        elif control.get("type") == "end":
+                            client_ended = True
+            except (WebSocketDisconnect, RuntimeError):
+                if server_ended:
+                    return  # end_session() has cleaned up already.
+                if not client_ended and resume_token and config.RESUME_GRACE_SECONDS > 0:
+                    link.detach()
+                    client_playing = False
+                    parked_sessions.park(resume_token, lambda new_ws: serve(new_ws, resumed=True), teardown, config.RESUME_GRACE_SECONDS)
+                    logging.info(f"Client dropped; session {resume_token[:8]} parked for {config.RESUME_GRACE_SECONDS}s.")
+                    return
+                logging.info("Client disconnected gracefully.")
+            except Exception as e:
+                logging.error(f"An unexpected error occurred: {e}", exc_info=True)
+                await send_client_message(link, phrases.with_phrase_audio({"type": "error", "message": "An unexpected server error occurred. Please check the logs."}, "unexpected_error"))
+            await teardown()
+            await link.close()
+
+        handed_off = True
+        await serve(websocket)
 
     except (WebSocketDisconnect, RuntimeError):
         logging.info("Client disconnected gracefully.")
     except Exception as e:
         error_msg = f"An unexpected error occurred: {e}"
         logging.error(error_msg, exc_info=True)
-        await send_client_message(websocket, {"type": "error", "message": "An unexpected server error occurred. Please check the logs."})
+        await send_client_message(websocket, phrases.with_phrase_audio({"type": "error", "message": "An unexpected server error occurred. Please check the logs."}, "unexpected_error"))
     
     finally:
-        if llm_task and not llm_task.done():
-            llm_task.cancel()
-        if client:
-            client.disconnect()
-        logging.info("Cleaned up connection resources.")
+        if not handed_off:
+            await teardown()
         if websocket.client_state.name != 'DISCONNECTED':
             await websocket.close()
\ No newline at end of file
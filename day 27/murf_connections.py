@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Tuple
+
+import websockets
+
+import audio_formats
+
+# --- Pre-opened Murf Connections ---
+# Every reply streams its text over its own Murf stream-input WebSocket, and opening
+# one (DNS, TLS, upgrade) used to sit between the transcript and the first audio.
+# Each session now keeps one connection opened ahead of need: the handshake opens
+# the first alongside STT, and take() hands it to a reply and immediately starts
+# opening the next, so the first turn and every later one start without a connect.
+# Murf closes idle streams, so a spare that has waited REFRESH_S (a pause in the
+# conversation) is swapped for a fresh one in the background before it expires; one
+# idle for longer than MAX_IDLE_S all the same is replaced rather than trusted.
+MURF_STREAM_URL = os.getenv("MURF_STREAM_URL", "wss://api.murf.ai/v1/speech/stream-input")  # Overridable for load tests.
+MAX_IDLE_S = 30.0
+REFRESH_S = 25.0
+
+
+def murf_stream_uri(api_key: str, output_format: dict) -> str:
+    return f"{MURF_STREAM_URL}?api-key={api_key}&{audio_formats.murf_stream_params(output_format)}"
+
+
+class MurfConnections:
+    def __init__(self, uri: str):
+        self.uri = uri
+        self._next: Optional[asyncio.Task] = None
+        self._refresh: Optional[asyncio.TimerHandle] = None
+        self.reused = 0
+        self.opened_on_demand = 0
+        self.refreshed = 0
+
+    async def _open(self) -> Tuple[object, float]:
+        connection = await websockets.connect(self.uri)
+        self._refresh = asyncio.get_running_loop().call_later(REFRESH_S, self._renew, asyncio.current_task())
+        return connection, time.monotonic()
+
+    def _renew(self, task: asyncio.Task):
+        # Still unused after REFRESH_S: open its replacement and retire it.
+        if self._next is not task:
+            return
+        self._next = None
+        self.refreshed += 1
+        self.prepare()
+        asyncio.create_task(self._discard(task))
+
+    @staticmethod
+    async def _discard(task: asyncio.Task):
+        try:
+            connection, _ = await task
+            await connection.close()
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+            pass
+
+    def _cancel_refresh(self):
+        if self._refresh:
+            self._refresh.cancel()
+            self._refresh = None
+
+    def prepare(self) -> asyncio.Task:
+        """Starts opening the next connection, unless one is already on its way, and returns its task."""
+        if self._next is None:
+            self._next = asyncio.create_task(self._open())
+        return self._next
+
+    async def take(self):
+        """Returns an open connection for one reply, and starts preparing the one after it."""
+        task, self._next = self._next, None
+        self._cancel_refresh()
+        connection = None
+        if task:
+            try:
+                connection, opened_at = await task  # Usually done already; otherwise it is closer than a new connect.
+                if connection.close_code is not None or time.monotonic() - opened_at > MAX_IDLE_S:
+                    await connection.close()
+                    connection = None
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                logging.warning(f"Pre-opened Murf connection failed, connecting on demand: {e}")
+                connection = None
+        if connection is None:
+            connection = await websockets.connect(self.uri)
+            self.opened_on_demand += 1
+        else:
+            self.reused += 1
+        self.prepare()
+        return connection
+
+    async def close(self):
+        task, self._next = self._next, None
+        self._cancel_refresh()
+        if task is None:
+            return
+        task.cancel()
+        try:
+            connection, _ = await task
+        except (asyncio.CancelledError, Exception):
+            return
+        await connection.close()
@@ -0,0 +1,66 @@
+import base64
+import logging
+import requests
+from pathlib import Path as PathLib
+
+import config
+
+# --- Pre-synthesized System Phrases ---
+# Every fixed line Diva speaks outside of an LLM reply is voiced once, cached in
+# PHRASES_DIR and held in memory, so error and status paths never wait on Murf.
+# (The timer completion line already ships as static/timer_complete.mp3.)
+PHRASES_DIR = PathLib(__file__).resolve().parent / "phrases"
+VOICE_ID = "en-US-natalie"
+SYSTEM_PHRASES = {
+    "casting_tavily_search": "Casting the Info Spell.",
+    "casting_calculate": "Drawing the Rune of Calculation.",
+    "casting_set_timer": "Invoking the Chronos Charm.",
+    "casting_get_weather": "Whispering to the winds.",
+    "gemini_key_invalid": "My connection to the Gemini realm has failed. Please check your Gemini key in the settings.",
+    "murf_key_invalid": "My voice spell has failed. Please check your Murf key in the settings.",
+    "keys_missing": "Some essential keys are missing, adventurer. Please set them in the settings.",
+    "unexpected_error": "Something went wrong in the aether. Please try again.",
+}
+
+phrase_audio: dict = {}  # phrase_key -> base64 MP3, ready to send to the client
+
+
+def synthesize_phrase(text: str) -> bytes:
+    """Voices a single phrase through Murf's REST API and returns the MP3 bytes."""
+    url = "https://api.murf.ai/v1/speech/generate"
+    headers = {"Accept": "application/json", "Content-Type": "application/json", "api-key": config.MURF_API_KEY}
+    payload = {"text": text, "voiceId": VOICE_ID, "format": "MP3", "sampleRate": 24000}
+    response = requests.post(url, json=payload, headers=headers, timeout=30)
+    response.raise_for_status()
+    audio_url = response.json().get("audioFile")
+    if not audio_url:
+        raise Exception("Murf API did not return an audio file.")
+    audio_response = requests.get(audio_url, timeout=30)
+    audio_response.raise_for_status()
+    return audio_response.content
+
+
+def load_phrases(synthesize: bool = True):
+    """Loads every system phrase into memory, voicing and saving any that are missing on disk."""
+    PHRASES_DIR.mkdir(exist_ok=True)
+    for phrase_key, text in SYSTEM_PHRASES.items():
+        if phrase_key in phrase_audio:
+            continue
+        path = PHRASES_DIR / f"{phrase_key}_{VOICE_ID}.mp3"
+        try:
+            if not path.exists():
+                if not synthesize or not config.MURF_API_KEY:
+                    continue
+                path.write_bytes(synthesize_phrase(text))
+            phrase_audio[phrase_key] = base64.b64encode(path.read_bytes()).decode("ascii")
+        except Exception as e:
+            logging.warning(f"Could not prepare system phrase '{phrase_key}': {e}")
+    logging.info(f"System phrases ready: {len(phrase_audio)}/{len(SYSTEM_PHRASES)}")
+
+
+def with_phrase_audio(message: dict, phrase_key: str) -> dict:
+    """Attaches the pre-synthesized audio for a phrase to a client message, when it is available."""
+    audio = phrase_audio.get(phrase_key)
+    if audio:
+        message["audio"] = audio
+    return message
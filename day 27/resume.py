@@ -0,0 +1,93 @@
+import asyncio
+import collections
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+# --- Session Resume ---
+# A dropped browser socket (network switch, tab sleep) no longer ends the session.
+# Everything that talks to the browser goes through a ClientLink; when the socket
+# drops, the session is parked under its resume token with its STT stream, chat
+# history and any reply still running. Messages sent meanwhile are kept in a bounded
+# backlog. A reconnect presenting the token within the grace window gets the backlog
+# replayed and the old session's receive loop; otherwise the session is torn down.
+
+
+class ClientLink:
+    """The browser end of a session, kept across WebSocket reconnects."""
+
+    def __init__(self, websocket: WebSocket, backlog_limit: int):
+        self.websocket: Optional[WebSocket] = websocket
+        self._backlog = collections.deque(maxlen=backlog_limit)
+        self.dropped_messages = 0
+
+    @property
+    def client_state(self) -> WebSocketState:
+        # While detached, report CONNECTED so senders queue into the backlog instead of dropping.
+        return self.websocket.client_state if self.websocket else WebSocketState.CONNECTED
+
+    def _keep(self, text: str):
+        if len(self._backlog) == self._backlog.maxlen:
+            self.dropped_messages += 1
+        self._backlog.append(text)
+
+    async def send_text(self, text: str):
+        if self.websocket is None:
+            self._keep(text)
+            return
+        try:
+            await self.websocket.send_text(text)
+        except (ConnectionError, WebSocketDisconnect, RuntimeError):
+            self._keep(text)  # The socket just died; the receive loop is about to park the session.
+
+    def detach(self):
+        self.websocket = None
+
+    async def attach(self, websocket: WebSocket) -> int:
+        """Switches to a new socket and replays the backlog to it. Returns how many messages were replayed."""
+        replayed = 0
+        while self._backlog:
+            await websocket.send_text(self._backlog.popleft())
+            replayed += 1
+        self.websocket = websocket
+        return replayed
+
+    async def close(self):
+        if self.websocket and self.websocket.client_state == WebSocketState.CONNECTED:
+            await self.websocket.close()
+
+
+class ParkedSessions:
+    """Sessions waiting for their browser to reconnect, by resume token."""
+
+    def __init__(self):
+        self._parked: Dict[str, Tuple[Callable, Callable[[], Awaitable[None]], asyncio.TimerHandle]] = {}
+
+    def park(self, token: str, serve: Callable, teardown: Callable[[], Awaitable[None]], grace_seconds: float):
+        def expire():
+            if self._parked.pop(token, None):
+                logging.info(f"Parked session {token[:8]} was not resumed within {grace_seconds}s; closing it.")
+                asyncio.create_task(teardown())
+
+        handle = asyncio.get_running_loop().call_later(grace_seconds, expire)
+        self._parked[token] = (serve, teardown, handle)
+
+    def claim(self, token: Optional[str]) -> Optional[Callable]:
+        """Takes a parked session off the shelf; returns its serve(websocket) coroutine function."""
+        entry = self._parked.pop(token, None) if token else None
+        if not entry:
+            return None
+        serve, _, handle = entry
+        handle.cancel()
+        return serve
+
+    async def close(self):
+        parked, self._parked = self._parked, {}
+        for _, teardown, handle in parked.values():
+            handle.cancel()
+            await teardown()
+
+    def __len__(self) -> int:
+        return len(self._parked)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import config
+from turns import Turn
+
+# --- Write-behind Session Journal ---
+# Makes conversations survive a restart. The session store hands new turns to
+# append(), which only adds them to an in-memory batch; a background thread writes
+# batches to SQLite (WAL mode) every flush interval or as soon as a batch fills. So
+# persistence never waits on disk in the request or speaking path, and a crash loses
+# at most the turns of the last flush interval. Sessions are read back lazily, the
+# first time a session id is seen after a restart.
+# The journal is also how workers share sessions when scaled out (see cluster.py):
+# every worker on a host can open the same SQLite file, and RedisSessionJournal is
+# the same journal on Redis for workers spread over several hosts.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,            -- Append order; tells flushed rows from still-pending ones.
+    record TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_by_session ON turns(session_id, id);
+"""
+
+
+class SessionJournal:
+    WRITE_ERRORS: Tuple[type, ...] = (sqlite3.Error,)
+
+    def __init__(self, path: str, flush_interval_ms: int = 1000, batch_size: int = 256):
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self._pending = []    # ("append", session_id, seq, record, created_at) | ("prune", session_id, keep) | ("expire", cutoff)
+        self._inflight = []   # The batch the writer thread is committing right now.
+        self._lock = threading.Condition()
+        self._closing = False
+        self.flushed_batches = 0
+        self.written_turns = 0
+
+        self._reader_lock = threading.Lock()
+        # Handshakes load sessions here, so a busy or locked database never stalls the event loop.
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-journal-read")
+        writer_db = self._open()
+        self._writer = threading.Thread(target=self._write_loop, args=(writer_db,), name="session-journal", daemon=True)
+        self._writer.start()
+
+    def _open(self):
+        """Prepares the backend; returns the connection the writer thread will own."""
+        writer_db = self._connect(check_same_thread=False)  # Used only by the writer thread from here on.
+        writer_db.executescript(SCHEMA)
+        self._next_seq = (writer_db.execute("SELECT MAX(seq) FROM turns").fetchone()[0] or 0) + 1
+        self._reader = self._connect(check_same_thread=False)
+        return writer_db
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, **kwargs)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def append(self, session_id: str, turn: Turn):
+        record = json.dumps(turn.to_record(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._pending.append(("append", session_id, self._next_seq, record, time.time()))
+            self._next_seq += 1
+            if len(self._pending) >= self.batch_size:
+                self._lock.notify()
+
+    def prune(self, session_id: str, keep: int = 0):
+        """Drops all but the newest `keep` turns of a session (all of them by default)."""
+        with self._lock:
+            self._pending.append(("prune", session_id, keep))
+
+    def expire(self, idle_seconds: float):
+        """Deletes sessions whose newest turn is older than idle_seconds."""
+        with self._lock:
+            self._pending.append(("expire", time.time() - idle_seconds))
+
+    def load(self, session_id: str) -> Optional[List[Turn]]:
+        """Reads a session back, including turns not flushed yet. None if it was never stored."""
+        # Snapshot the unflushed turns first: a batch committing in between is then
+        # found in both places (and de-duplicated by seq) rather than in neither.
+        unflushed = self._unflushed(session_id)
+        return self._merge(self._read(session_id), unflushed)
+
+    async def load_async(self, session_id: str) -> Optional[List[Turn]]:
+        """load() on the journal's read thread, for callers on the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, self.load, session_id)
+
+    def _unflushed(self, session_id: str) -> list:
+        with self._lock:
+            return [op for op in self._inflight + self._pending if op[0] == "append" and op[1] == session_id]
+
+    @staticmethod
+    def _merge(rows: List[Tuple[int, str]], unflushed: list) -> Optional[List[Turn]]:
+        # Workers number their appends independently, so a seq is only unique together with its record.
+        written = set(rows)
+        records = [record for _, record in rows] + [op[3] for op in unflushed if (op[2], op[3]) not in written]
+        if not records:
+            return None
+        turns = []
+        for record in records:
+            turn = Turn.from_record(json.loads(record))
+            turn.persisted = True
+            turns.append(turn)
+        return turns
+
+    def _read(self, session_id: str) -> List[Tuple[int, str]]:
+        with self._reader_lock:
+            return self._reader.execute("SELECT seq, record FROM turns WHERE session_id = ? ORDER BY id", (session_id,)).fetchall()
+
+    def _write_loop(self, db: sqlite3.Connection):
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closing and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._lock.wait(timeout=remaining)
+                self._inflight, self._pending = self._pending, []
+                closing = self._closing
+            if self._inflight:
+                try:
+                    self._write_batch(db, self._inflight)
+                except self.WRITE_ERRORS as e:
+                    logging.error(f"Session journal could not write {len(self._inflight)} operation(s): {e}")
+                with self._lock:
+                    self._inflight = []
+            if closing:
+                self._close(db)
+                return
+
+    def _write_batch(self, db: sqlite3.Connection, batch: list):
+        with db:
+            for op in batch:
+                if op[0] == "append":
+                    db.execute("INSERT INTO turns (session_id, seq, record, created_at) VALUES (?, ?, ?, ?)", op[1:])
+                    self.written_turns += 1
+                elif op[0] == "prune":
+                    db.execute("DELETE FROM turns WHERE session_id = ? AND id NOT IN "
+                               "(SELECT id FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)", (op[1], op[1], op[2]))
+                elif op[0] == "expire":
+                    db.execute("DELETE FROM turns WHERE session_id IN "
+                               "(SELECT session_id FROM turns GROUP BY session_id HAVING MAX(created_at) < ?)", (op[1],))
+        self.flushed_batches += 1
+
+    def close(self):
+        """Flushes everything still pending and stops the writer."""
+        with self._lock:
+            self._closing = True
+            self._lock.notify()
+        self._writer.join(timeout=10)
+        self._read_executor.shutdown(wait=True)
+        self._reader.close()
+
+    async def aclose(self):
+        """close() for callers on the event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def _close(self, db: sqlite3.Connection):
+        db.close()
+
+
+class RedisSessionJournal(SessionJournal):
+    """The write-behind journal on Redis: one list per session, expired by Redis itself."""
+    KEY_PREFIX = "voicebot:session:"
+
+    def __init__(self, url: str, idle_ttl_seconds: float, flush_interval_ms: int = 1000, batch_size: int = 256):
+        try:  # Only needed when sessions are shared across hosts, so not in requirements.txt.
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("SESSION_REDIS_URL is set but the redis package is not installed: pip install redis") from e
+        self.WRITE_ERRORS = (redis.RedisError,)
+        self.idle_ttl_seconds = int(idle_ttl_seconds)
+        self._redis = redis.Redis.from_url(url, decode_responses=True)  # Thread-safe connection pool, for the writer.
+        self._aredis = redis.asyncio.Redis.from_url(url, decode_responses=True)  # For loads on the event loop.
+        super().__init__(url, flush_interval_ms, batch_size)
+
+    def _open(self):
+        self._next_seq = 1
+        self._reader = self._redis
+        return self._redis
+
+    def _read(self, session_id: str) -> List[Tuple[int, str]]:
+        return self._rows(self._redis.lrange(self.KEY_PREFIX + session_id, 0, -1))
+
+    async def load_async(self, session_id: str) -> Optional[List[Turn]]:
+        unflushed = self._unflushed(session_id)
+        items = await self._aredis.lrange(self.KEY_PREFIX + session_id, 0, -1)
+        return self._merge(self._rows(items), unflushed)
+
+    @staticmethod
+    def _rows(items: List[str]) -> List[Tuple[int, str]]:
+        rows = []
+        for item in items:
+            seq, _, record = item.partition(":")
+            rows.append((int(seq), record))
+        return rows
+
+    def _write_batch(self, db, batch: list):
+        pipe = db.pipeline(transaction=False)
+        for op in batch:
+            if op[0] == "append":
+                key = self.KEY_PREFIX + op[1]
+                pipe.rpush(key, f"{op[2]}:{op[3]}")
+                pipe.expire(key, self.idle_ttl_seconds)
+                self.written_turns += 1
+            elif op[0] == "prune":
+                if op[2]:
+                    pipe.ltrim(self.KEY_PREFIX + op[1], -op[2], -1)
+                else:
+                    pipe.delete(self.KEY_PREFIX + op[1])
+            # "expire" needs no work here: every append renews the session's TTL.
+        pipe.execute()
+        self.flushed_batches += 1
+
+    async def aclose(self):
+        await super().aclose()
+        await self._aredis.aclose()
+
+    def _close(self, db):
+        pass  # The shared client is closed with the reader in close().
+
+
+def open_session_journal() -> Optional[SessionJournal]:
+    if config.SESSION_REDIS_URL:
+        return RedisSessionJournal(config.SESSION_REDIS_URL, config.SESSION_IDLE_TTL_SECONDS,
+                                   config.SESSION_FLUSH_INTERVAL_MS, config.SESSION_FLUSH_BATCH)
+    if not config.SESSION_DB_PATH:
+        return None
+    return SessionJournal(config.SESSION_DB_PATH, config.SESSION_FLUSH_INTERVAL_MS, config.SESSION_FLUSH_BATCH)
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import config
+from session_journal import SessionJournal
+from turns import Turn
+
+# --- Bounded Chat Session Store ---
+# Chat histories outlive a single WebSocket connection: the browser sends its session
+# id in the config message, so pressing record again continues the same conversation.
+# Histories are lists of compact Turn records (see turns.py).
+#   - at most SESSION_MAX_COUNT sessions in memory; the least recently used one is
+#     evicted (spilled to disk when SESSION_SPILL_DIR is set, otherwise dropped)
+#   - at most SESSION_MAX_BYTES of serialized history per session; the oldest
+#     exchanges are trimmed first
+#   - sessions idle for SESSION_IDLE_TTL_SECONDS expire, in memory and on disk
+# Memory use is reported as the serialized size of the turns held in memory.
+# With a SessionJournal attached, new turns are also persisted write-behind, and a
+# session missing from memory and the spill directory is reloaded from it.
+SESSION_MAX_COUNT = config.SESSION_MAX_COUNT
+SESSION_MAX_BYTES = config.SESSION_MAX_BYTES
+SESSION_IDLE_TTL_SECONDS = config.SESSION_IDLE_TTL_SECONDS
+SESSION_SPILL_DIR = config.SESSION_SPILL_DIR
+SESSION_SWEEP_INTERVAL_SECONDS = 60
+
+
+def _history_bytes(history: List[Turn]) -> int:
+    return sum(turn.nbytes for turn in history)
+
+
+def _starts_exchange(turn: Turn) -> bool:
+    """A history must start with a user turn that is not a tool result."""
+    return turn.role == "user" and turn.tool_name is None
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, max_session_bytes: int = SESSION_MAX_BYTES,
+                 idle_ttl_seconds: float = SESSION_IDLE_TTL_SECONDS, spill_dir: Optional[str] = SESSION_SPILL_DIR,
+                 journal: Optional[SessionJournal] = None):
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.spill_dir = spill_dir
+        self.journal = journal
+        self._sessions = OrderedDict()  # session_id -> [history, size_bytes, last_used]
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.trimmed_messages = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id.replace(os.sep, '_')}.json")
+
+    def _load_spilled(self, session_id: str) -> Optional[List[Turn]]:
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.idle_ttl_seconds:
+                os.remove(path)
+                self.expirations += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                history = [Turn.from_record(record) for record in json.load(f)]
+            for turn in history:
+                turn.persisted = True  # Journaled before the session was spilled.
+            os.remove(path)
+            return history
+        except (OSError, ValueError, TypeError):
+            return None
+
+    async def get(self, session_id: str) -> List[Turn]:
+        """Returns the session's history (empty for unknown or expired sessions)."""
+        entry = self._sessions.get(session_id)
+        if entry and time.monotonic() - entry[2] > self.idle_ttl_seconds:
+            self._drop(session_id)
+            self.expirations += 1
+            entry = None
+        if entry:
+            entry[2] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+        history = self._load_spilled(session_id)
+        if history is None and self.journal:
+            history = await self.journal.load_async(session_id)
+        if history is None:
+            return []
+        self.put(session_id, history)
+        return history
+
+    def put(self, session_id: str, history: List[Turn]):
+        """Stores (or re-measures) a session's history, trimming it in place to the byte limit."""
+        if self.journal:
+            for turn in history:
+                if not turn.persisted:
+                    self.journal.append(session_id, turn)
+                    turn.persisted = True
+        size = _history_bytes(history)
+        trimmed = size > self.max_session_bytes
+        while history and size > self.max_session_bytes:
+            del history[0]
+            while history and not _starts_exchange(history[0]):
+                del history[0]
+                self.trimmed_messages += 1
+            self.trimmed_messages += 1
+            size = _history_bytes(history)
+        if trimmed and self.journal:
+            self.journal.prune(session_id, keep=len(history))
+
+        if session_id in self._sessions:
+            self._bytes -= self._sessions[session_id][1]
+        self._sessions[session_id] = [history, size, time.monotonic()]
+        self._sessions.move_to_end(session_id)
+        self._bytes += size
+        while len(self._sessions) > self.max_sessions:
+            self._evict_lru()
+
+    def delete(self, session_id: str):
+        if session_id in self._sessions:
+            self._drop(session_id)
+        if self.journal:
+            self.journal.prune(session_id)
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(session_id))
+            except OSError:
+                pass
+
+    def _drop(self, session_id: str):
+        _, size, _ = self._sessions.pop(session_id)
+        self._bytes -= size
+
+    def _evict_lru(self):
+        session_id, (history, size, _) = self._sessions.popitem(last=False)
+        self._bytes -= size
+        self.evictions += 1
+        if self.spill_dir and history:
+            try:
+                with open(self._spill_path(session_id), "w", encoding="utf-8") as f:
+                    json.dump([turn.to_record() for turn in history], f, ensure_ascii=False, default=str)
+            except OSError as e:
+                logging.warning(f"Could not spill session {session_id} to disk: {e}")
+
+    def sweep(self):
+        """Expires idle sessions in memory and on disk."""
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        for session_id in [sid for sid, entry in self._sessions.items() if entry[2] < cutoff]:
+            self._drop(session_id)
+            self.expirations += 1
+        if self.journal:
+            self.journal.expire(self.idle_ttl_seconds)
+        if self.spill_dir:
+            wall_cutoff = time.time() - self.idle_ttl_seconds
+            for entry in os.scandir(self.spill_dir):
+                try:
+                    if entry.name.endswith(".json") and entry.stat().st_mtime < wall_cutoff:
+                        os.remove(entry.path)
+                        self.expirations += 1
+                except OSError:
+                    pass
+
+
+    def stats(self) -> dict:
+        spilled = [entry for entry in os.scandir(self.spill_dir) if entry.name.endswith(".json")] if self.spill_dir else []
+        return {
+            "sessions": len(self._sessions),
+            "memory_bytes": self._bytes,
+            "spilled_sessions": len(spilled),
+            "spilled_bytes": sum(entry.stat().st_size for entry in spilled),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "trimmed_messages": self.trimmed_messages,
+        }
+
+
+async def keep_sessions_tidy(store: "SessionStore"):
+    """Background task: expires idle sessions and logs the store's footprint."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+        store.sweep()
+        logging.info(f"Session store: {store.stats()}")
+
+
+session_store = SessionStore()
@@ -0,0 +1,71 @@
+// --- Microphone Capture Worklet ---
+// Runs on the audio rendering thread. Each input sample goes through a windowed-sinc
+// low-pass (so nothing above the new Nyquist aliases into the speech band), the
+// filtered signal is resampled to the target rate by linear interpolation, and the
+// result is posted to the main thread as fixed-size PCM16 frames.
+const FILTER_TAPS = 63;
+
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const { targetSampleRate = 16000, frameMs = 20 } = options.processorOptions || {};
+        this.step = sampleRate / targetSampleRate;
+        this.frameSize = Math.round(targetSampleRate * frameMs / 1000);
+        this.frame = new Int16Array(this.frameSize);
+        this.frameIndex = 0;
+
+        const cutoff = Math.min(1, targetSampleRate / sampleRate) * 0.9;
+        this.kernel = new Float32Array(FILTER_TAPS);
+        let sum = 0;
+        for (let k = 0; k < FILTER_TAPS; k++) {
+            const n = k - (FILTER_TAPS - 1) / 2;
+            const sinc = n === 0 ? 1 : Math.sin(Math.PI * cutoff * n) / (Math.PI * cutoff * n);
+            const hamming = 0.54 - 0.46 * Math.cos((2 * Math.PI * k) / (FILTER_TAPS - 1));
+            this.kernel[k] = cutoff * sinc * hamming;
+            sum += this.kernel[k];
+        }
+        for (let k = 0; k < FILTER_TAPS; k++) this.kernel[k] /= sum;
+
+        // Ring of recent input samples, stored twice so the filter reads one contiguous window.
+        this.history = new Float32Array(FILTER_TAPS * 2);
+        this.writeIndex = 0;
+        this.previous = 0;
+        this.position = 0;
+    }
+
+    emit(sample) {
+        const clamped = Math.max(-1, Math.min(1, sample));
+        this.frame[this.frameIndex++] = clamped < 0 ? clamped * 0x8000 : clamped * 0x7FFF;
+        if (this.frameIndex === this.frameSize) {
+            this.port.postMessage(this.frame.buffer, [this.frame.buffer]);
+            this.frame = new Int16Array(this.frameSize);
+            this.frameIndex = 0;
+        }
+    }
+
+    process(inputs) {
+        const input = inputs[0] && inputs[0][0];
+        if (!input) return true;
+        const { kernel, history } = this;
+        for (let i = 0; i < input.length; i++) {
+            history[this.writeIndex] = input[i];
+            history[this.writeIndex + FILTER_TAPS] = input[i];
+            this.writeIndex = (this.writeIndex + 1) % FILTER_TAPS;
+
+            let filtered = 0;
+            for (let k = 0; k < FILTER_TAPS; k++) filtered += kernel[k] * history[this.writeIndex + k];
+
+            // `position` is where the next output sample falls between the previous
+            // filtered sample (0) and this one (1).
+            while (this.position <= 1) {
+                this.emit(this.previous + (filtered - this.previous) * this.position);
+                this.position += this.step;
+            }
+            this.position -= 1;
+            this.previous = filtered;
+        }
+        return true;
+    }
+}
+
+registerProcessor("pcm-capture", PcmCaptureProcessor);
@@ -5,11 +5,21 @@ document.addEventListener("DOMContentLoaded", () => {
     let isRecording = false;
     let socket = null;
     let heartbeatInterval = null;
+    // Lets the server hand a dropped connection its running session back (see resume.py).
+    let resumeToken = null;
+    let reconnectAttempts = 0;
+    const MAX_RECONNECT_ATTEMPTS = 5;
+    let captureWorkletReady = null;
 
-    let audioQueue = [];
-    let isPlaying = false;
     let currentAiMessageContentElement = null;
-    let currentAudioSource = null;
+    let lastUserMessageContentElement = null;
+    let liveCaptionElement = null;
+    // Identifies this conversation to the server so it survives reconnects; "Clear" starts a new one.
+    const newChatSessionId = () => (window.crypto?.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+    let chatSessionId = newChatSessionId();
+    let outputFormat = { encoding: "mp3", sample_rate: 44100 };
+    let opusDecoder = null;
+    let pendingOpusDecodes = [];
 
     const recordBtn = document.getElementById("recordBtn");
     const statusDisplay = document.getElementById("statusDisplay");
@@ -72,30 +82,143 @@ document.addEventListener("DOMContentLoaded", () => {
     
     loadApiKeys();
 
-    const stopCurrentPlayback = () => {
-        if (currentAudioSource) {
-            currentAudioSource.stop();
-            currentAudioSource = null;
+    const playPhraseAudio = (base64Audio) => {
+        if (!base64Audio) return;
+        try { new Audio(`data:audio/mpeg;base64,${base64Audio}`).play(); } catch (e) { console.error("Phrase audio failed", e); }
+    };
+
+    // --- TTS Output Format ---
+    // Desktop clients take raw PCM16 (no decode step at all); mobile clients take
+    // Opus when WebCodecs can decode it. Anything else gets the MP3 default.
+    const preferredAudioFormat = () => {
+        const isMobile = navigator.userAgentData?.mobile ?? /Mobi|Android|iPhone|iPad/i.test(navigator.userAgent);
+        if (isMobile && "AudioDecoder" in window) return { encoding: "opus", sample_rate: 24000 };
+        return { encoding: "pcm16", sample_rate: 24000 };
+    };
+
+    const setupOpusDecoder = () => {
+        if (opusDecoder) opusDecoder.close();
+        pendingOpusDecodes = [];
+        opusDecoder = new AudioDecoder({
+            output: (audioData) => {
+                const buffer = audioContext.createBuffer(1, audioData.numberOfFrames, audioData.sampleRate);
+                audioData.copyTo(buffer.getChannelData(0), { planeIndex: 0, format: "f32-planar" });
+                audioData.close();
+                pendingOpusDecodes.shift()?.resolve(buffer);
+            },
+            error: (error) => {
+                console.error("Opus decoder error:", error);
+                pendingOpusDecodes.splice(0).forEach(({ reject }) => reject(error));
+            }
+        });
+        opusDecoder.configure({ codec: "opus", sampleRate: outputFormat.sample_rate, numberOfChannels: 1 });
+    };
+
+    const decodeChunk = (chunk) => {
+        if (outputFormat.encoding === "pcm16") {
+            const pcm = new Int16Array(chunk);
+            const buffer = audioContext.createBuffer(1, pcm.length, outputFormat.sample_rate);
+            const channel = buffer.getChannelData(0);
+            for (let i = 0; i < pcm.length; i++) channel[i] = pcm[i] / 0x8000;
+            return Promise.resolve(buffer);
         }
-        audioQueue = [];
-        isPlaying = false;
+        if (outputFormat.encoding === "opus" && opusDecoder) {
+            return new Promise((resolve, reject) => {
+                pendingOpusDecodes.push({ resolve, reject });
+                opusDecoder.decode(new EncodedAudioChunk({ type: "key", timestamp: 0, data: chunk }));
+            });
+        }
+        return audioContext.decodeAudioData(chunk);
+    };
+
+    // --- Playback Engine ---
+    // Every chunk is decoded the moment it arrives and scheduled back-to-back on the
+    // AudioContext clock, so there is no gap at chunk boundaries. The first chunk of a
+    // reply starts right away; if the timeline ever runs dry mid-reply (an underrun),
+    // playback restarts behind a jitter buffer that grows after each underrun and
+    // relaxes again after clean replies.
+    const JITTER_MIN_S = 0.02;
+    const JITTER_MAX_S = 0.3;
+    const JITTER_STEP_S = 0.04;
+    const START_LEAD_S = 0.005;
+    let jitterTarget = JITTER_MIN_S;
+    let nextPlayTime = 0;
+    let scheduledSources = new Set();
+    let scheduleChain = Promise.resolve();
+    let playbackGeneration = 0;
+    let replyChunks = 0;
+    let replyUnderruns = 0;
+    const playbackStats = { chunks: 0, underruns: 0, decodeErrors: 0, jitterTargetMs: JITTER_MIN_S * 1000, interrupts: 0, lastInterrupt: null };
+    window.divaPlaybackStats = playbackStats;
+
+    const sendControl = (message) => {
+        if (socket?.readyState === WebSocket.OPEN) socket.send(JSON.stringify(message));
+    };
+
+    // The server only barges in while something is audible, so it is told when playback starts and stops.
+    const onPlaybackIdle = () => sendControl({ type: "playback", active: false });
+
+    const scheduleBuffer = (buffer) => {
+        const now = audioContext.currentTime;
+        if (nextPlayTime < now + START_LEAD_S) {
+            if (replyChunks > 0) {
+                replyUnderruns++;
+                playbackStats.underruns++;
+                jitterTarget = Math.min(JITTER_MAX_S, jitterTarget + JITTER_STEP_S);
+                playbackStats.jitterTargetMs = Math.round(jitterTarget * 1000);
+                nextPlayTime = now + jitterTarget;
+            } else {
+                nextPlayTime = now + START_LEAD_S;
+            }
+        }
+        const sourceNode = audioContext.createBufferSource();
+        sourceNode.buffer = buffer;
+        sourceNode.connect(audioContext.destination);
+        sourceNode.start(nextPlayTime);
+        sourceNode.onended = () => {
+            scheduledSources.delete(sourceNode);
+            if (!scheduledSources.size) onPlaybackIdle();
+        };
+        if (!scheduledSources.size) sendControl({ type: "playback", active: true });
+        scheduledSources.add(sourceNode);
+        nextPlayTime += buffer.duration;
+        replyChunks++;
+        playbackStats.chunks++;
+    };
+
+    const enqueueAudioChunk = (chunk) => {
+        if (!audioContext || audioContext.state === "closed") return;
+        const generation = playbackGeneration;
+        // Decoding starts now (decode-ahead); scheduling still happens in arrival order.
+        const decoded = decodeChunk(chunk);
+        scheduleChain = scheduleChain
+            .then(() => decoded)
+            .then((buffer) => { if (generation === playbackGeneration) scheduleBuffer(buffer); })
+            .catch((error) => { playbackStats.decodeErrors++; console.error("Error decoding audio data:", error); });
     };
 
-    const playNextChunk = () => {
-        if (!audioQueue.length || !audioContext || audioContext.state === "closed") {
-            isPlaying = false;
-            return;
+    const finishReplyPlayback = () => {
+        if (replyChunks > 0 && replyUnderruns === 0) {
+            jitterTarget = Math.max(JITTER_MIN_S, jitterTarget * 0.8);
+            playbackStats.jitterTargetMs = Math.round(jitterTarget * 1000);
         }
-        isPlaying = true;
-        const chunk = audioQueue.shift();
-        audioContext.decodeAudioData(chunk, (buffer) => {
-            const sourceNode = audioContext.createBufferSource();
-            sourceNode.buffer = buffer;
-            sourceNode.connect(audioContext.destination);
-            sourceNode.start();
-            currentAudioSource = sourceNode;
-            sourceNode.onended = () => { currentAudioSource = null; playNextChunk(); };
-        }, (error) => { console.error("Error decoding audio data:", error); playNextChunk(); });
+        console.log("Playback stats:", { ...playbackStats, replyChunks, replyUnderruns });
+        replyChunks = 0;
+        replyUnderruns = 0;
+    };
+
+    const stopCurrentPlayback = () => {
+        playbackGeneration++;
+        const wasPlaying = scheduledSources.size > 0;
+        scheduledSources.forEach((sourceNode) => {
+            sourceNode.onended = null;
+            try { sourceNode.stop(); } catch (e) { /* already stopped */ }
+        });
+        scheduledSources.clear();
+        if (wasPlaying) onPlaybackIdle();
+        nextPlayTime = 0;
+        replyChunks = 0;
+        replyUnderruns = 0;
     };
 
     const startRecording = async () => {
@@ -109,8 +232,13 @@ document.addEventListener("DOMContentLoaded", () => {
 
         isRecording = true;
         updateUIForRecording(true);
+        openSocket();
+    };
+
+    const openSocket = () => {
         const wsProtocol = window.location.protocol === "https:" ? "wss:" : "ws:";
-        socket = new WebSocket(`${wsProtocol}//${window.location.host}/ws`);
+        // The session id in the URL lets a scaled-out deployment route this chat to the same worker every time.
+        socket = new WebSocket(`${wsProtocol}//${window.location.host}/ws?session=${encodeURIComponent(chatSessionId)}`);
 
         socket.onopen = async () => {
             console.log("WebSocket connection established. Sending configuration.");
@@ -121,36 +249,33 @@ document.addEventListener("DOMContentLoaded", () => {
                 weather: localStorage.getItem("weatherapiKey"),
                 tavily: localStorage.getItem("tavilyaiKey")
             };
-            socket.send(JSON.stringify({ type: "config", keys: apiKeys }));
+            socket.send(JSON.stringify({ type: "config", keys: apiKeys, audio_format: preferredAudioFormat(), session_id: chatSessionId, resume_token: resumeToken }));
             
+            if (heartbeatInterval) clearInterval(heartbeatInterval);
             heartbeatInterval = setInterval(() => { 
                 if (socket?.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: "ping" })); 
             }, 15000);
 
+            // On a resume the microphone is still running; its frames just go to the new socket.
+            if (processor) return;
             try {
                 const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
                 source = audioContext.createMediaStreamSource(stream);
-                processor = audioContext.createScriptProcessor(4096, 1, 1);
-                
-                processor.onaudioprocess = (event) => {
-                    if (!isRecording) return; 
+                // The worklet low-pass filters, resamples to 16 kHz and hands back 20 ms PCM16 frames.
+                captureWorkletReady = captureWorkletReady || audioContext.audioWorklet.addModule("/static/capture-worklet.js");
+                await captureWorkletReady;
+                processor = new AudioWorkletNode(audioContext, "pcm-capture", {
+                    numberOfInputs: 1,
+                    numberOfOutputs: 0,
+                    channelCount: 1,
+                    processorOptions: { targetSampleRate: 16000, frameMs: 20 }
+                });
 
-                    const inputData = event.inputBuffer.getChannelData(0);
-                    const targetSampleRate = 16000;
-                    const ratio = audioContext.sampleRate / targetSampleRate;
-                    const newLength = Math.floor(inputData.length / ratio);
-                    const downsampledData = new Float32Array(newLength);
-                    for (let i = 0; i < newLength; i++) { downsampledData[i] = inputData[Math.floor(i * ratio)]; }
-                    const pcmData = new Int16Array(downsampledData.length);
-                    for (let i = 0; i < pcmData.length; i++) {
-                        const sample = Math.max(-1, Math.min(1, downsampledData[i]));
-                        pcmData[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
-                    }
-                    if (socket?.readyState === WebSocket.OPEN) socket.send(pcmData.buffer);
+                processor.port.onmessage = (event) => {
+                    if (isRecording && socket?.readyState === WebSocket.OPEN) socket.send(event.data);
                 };
-                
+
                 source.connect(processor);
-                processor.connect(audioContext.destination);
                 recordBtn.mediaStream = stream;
             } catch (micError) {
                 alert("Could not access microphone. Please grant permission and try again.");
@@ -164,12 +289,46 @@ document.addEventListener("DOMContentLoaded", () => {
             if (data.type === 'pong') return;
             console.log("RECEIVED MESSAGE:", data);
             switch (data.type) {
+                case "session":
+                    resumeToken = data.resume_token;
+                    reconnectAttempts = 0;
+                    break;
+                case "resumed":
+                    reconnectAttempts = 0;
+                    statusDisplay.textContent = "Reconnected! The adventure continues.";
+                    break;
+                case "audio_format":
+                    outputFormat = data;
+                    if (outputFormat.encoding === "opus") setupOpusDecoder();
+                    break;
                 case "status":
                     statusDisplay.textContent = data.message;
+                    playPhraseAudio(data.audio);
                     break;
                 case "transcription":
-                    if (data.end_of_turn && data.text) {
-                        addToChatLog(data.text, 'user');
+                    if (!data.end_of_turn) {
+                        // Live caption: one chat line per turn, rewritten as the partials arrive.
+                        if (!liveCaptionElement) {
+                            liveCaptionElement = addToChatLog("", 'user');
+                            liveCaptionElement.classList.add("opacity-60");
+                        }
+                        liveCaptionElement.textContent = data.text;
+                        chatContainer.scrollTop = chatContainer.scrollHeight;
+                    } else if (!data.text) {
+                        if (liveCaptionElement) liveCaptionElement.parentElement.remove();
+                        liveCaptionElement = null;
+                    } else if (data.replaces_turn && lastUserMessageContentElement) {
+                        // The reply was started from the raw transcript; show the formatted one.
+                        lastUserMessageContentElement.textContent = data.text;
+                    } else {
+                        if (liveCaptionElement) {
+                            liveCaptionElement.classList.remove("opacity-60");
+                            liveCaptionElement.textContent = data.text;
+                            lastUserMessageContentElement = liveCaptionElement;
+                            liveCaptionElement = null;
+                        } else {
+                            lastUserMessageContentElement = addToChatLog(data.text, 'user');
+                        }
                         statusDisplay.textContent = "Diva is pondering the quest...";
                         currentAiMessageContentElement = null;
                     }
@@ -183,6 +342,19 @@ document.addEventListener("DOMContentLoaded", () => {
                         chatContainer.scrollTop = chatContainer.scrollHeight;
                     }
                     break;
+                case "interrupt": {
+                    const stopStartedAt = performance.now();
+                    stopCurrentPlayback();
+                    playbackStats.interrupts++;
+                    playbackStats.lastInterrupt = {
+                        source: data.source,
+                        serverReactionMs: data.reaction_ms,
+                        clientStopMs: Math.round((performance.now() - stopStartedAt) * 10) / 10
+                    };
+                    console.log("Barge-in:", playbackStats.lastInterrupt);
+                    statusDisplay.textContent = "Listening...";
+                    break;
+                }
                 case "audio_start":
                     stopCurrentPlayback();
                     statusDisplay.textContent = "Receiving Diva's transmission...";
@@ -208,22 +380,33 @@ document.addEventListener("DOMContentLoaded", () => {
                         const byteNumbers = new Array(audioData.length);
                         for (let i = 0; i < audioData.length; i++) byteNumbers[i] = audioData.charCodeAt(i);
                         const byteArray = new Uint8Array(byteNumbers);
-                        audioQueue.push(byteArray.buffer);
-                        if (!isPlaying) playNextChunk();
+                        enqueueAudioChunk(byteArray.buffer);
                     }
                     break;
                 case "audio_end":
+                    scheduleChain = scheduleChain.then(finishReplyPlayback);
                     statusDisplay.textContent = "Diva's transmission is complete.";
                     break;
                 case "error":
                     showNotification(data.message, true);
+                    playPhraseAudio(data.audio);
                     statusDisplay.textContent = "An error occurred. Please check the notifications.";
                     stopRecording();
                     break;
             }
         };
-        socket.onclose = () => { console.log("WebSocket connection closed."); stopRecording(false); };
-        socket.onerror = (error) => { console.error("WebSocket Error:", error); stopRecording(); };
+        socket.onclose = () => {
+            console.log("WebSocket connection closed.");
+            if (isRecording && resumeToken && reconnectAttempts < MAX_RECONNECT_ATTEMPTS) {
+                // Unexpected drop: the server keeps the session for a grace period, so reconnect with backoff.
+                const delay = 250 * 2 ** reconnectAttempts++;
+                statusDisplay.textContent = "Connection lost, reconnecting...";
+                setTimeout(() => { if (isRecording) openSocket(); }, delay);
+                return;
+            }
+            stopRecording(false);
+        };
+        socket.onerror = (error) => { console.error("WebSocket Error:", error); };
     };
 
     const stopRecording = async (shouldUpdateStatus = true) => {
@@ -234,7 +417,7 @@ document.addEventListener("DOMContentLoaded", () => {
         if (heartbeatInterval) clearInterval(heartbeatInterval);
         if (processor) {
             processor.disconnect();
-            processor.onaudioprocess = null;
+            processor.port.onmessage = null;
             processor = null;
         }
         if (source) {
@@ -242,8 +425,13 @@ document.addEventListener("DOMContentLoaded", () => {
             source = null;
         }
         if (recordBtn.mediaStream) recordBtn.mediaStream.getTracks().forEach(track => track.stop());
-        if (socket?.readyState === WebSocket.OPEN) socket.close();
+        if (socket?.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: "end" }));  // A deliberate stop; the server need not keep the session.
+            socket.close();
+        }
         socket = null;
+        resumeToken = null;
+        reconnectAttempts = 0;
         updateUIForRecording(false, shouldUpdateStatus);
     };
 
@@ -279,7 +467,7 @@ document.addEventListener("DOMContentLoaded", () => {
         return contentSpan;
     };
 
-    clearBtn.addEventListener("click", () => { chatContainer.innerHTML = ''; clearBtnContainer.classList.add("hidden"); });
+    clearBtn.addEventListener("click", () => { chatContainer.innerHTML = ''; clearBtnContainer.classList.add("hidden"); chatSessionId = newChatSessionId(); });
     recordBtn.addEventListener("click", () => { if (isRecording) stopRecording(); else startRecording(); });
     window.addEventListener('beforeunload', () => { if (isRecording) stopRecording(); });
 });
\ No newline at end of file
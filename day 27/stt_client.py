@@ -0,0 +1,286 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+# --- Native asyncio AssemblyAI Streaming Client ---
+# Speaks the Universal Streaming v3 WebSocket protocol directly on the event loop
+# (the approach from day 17), so a session costs two tasks instead of SDK threads
+# and events are delivered on the loop without run_coroutine_threadsafe hops.
+ASSEMBLYAI_STREAM_URL = os.getenv("ASSEMBLYAI_STREAM_URL", "wss://streaming.assemblyai.com/v3/ws")  # Overridable for load tests.
+FATAL_CLOSE_CODES = {1000, 1008}  # Normal closure, and policy violation (bad or expired key).
+STABLE_STREAM_S = 30.0  # A stream up this long has recovered; its next drop gets a fresh set of reconnects.
+
+
+@dataclass
+class BeginEvent:
+    session_id: str
+    expires_at: Optional[int] = None
+
+
+@dataclass
+class Word:
+    text: str
+    start: int
+    end: int
+    confidence: float
+    word_is_final: bool
+
+
+@dataclass
+class TurnEvent:
+    transcript: str
+    turn_order: int
+    end_of_turn: bool
+    turn_is_formatted: bool
+    end_of_turn_confidence: float = 0.0
+    words: List[Word] = field(default_factory=list)
+
+
+@dataclass
+class TerminationEvent:
+    audio_duration_seconds: float = 0.0
+    session_duration_seconds: float = 0.0
+
+
+@dataclass
+class ErrorEvent:
+    message: str
+    code: Optional[int] = None
+    fatal: bool = False
+
+
+class SttStreamClosed(Exception):
+    """The stream ended for good (fatal close code or reconnects exhausted)."""
+
+
+class StreamingEvents:
+    Begin = "Begin"
+    Turn = "Turn"
+    Termination = "Termination"
+    Error = "Error"
+
+
+def parse_event(message: dict):
+    """Turns a raw v3 protocol message into its typed event, or None for unknown types."""
+    message_type = message.get("type")
+    if message_type == "Begin":
+        return BeginEvent(session_id=message.get("id", ""), expires_at=message.get("expires_at"))
+    if message_type == "Turn":
+        words = [Word(text=w.get("text", ""), start=w.get("start", 0), end=w.get("end", 0),
+                      confidence=w.get("confidence", 0.0), word_is_final=w.get("word_is_final", False))
+                 for w in message.get("words") or []]
+        return TurnEvent(transcript=message.get("transcript", ""), turn_order=message.get("turn_order", 0),
+                         end_of_turn=message.get("end_of_turn", False), turn_is_formatted=message.get("turn_is_formatted", False),
+                         end_of_turn_confidence=message.get("end_of_turn_confidence", 0.0), words=words)
+    if message_type == "Termination":
+        return TerminationEvent(audio_duration_seconds=message.get("audio_duration_seconds", 0.0),
+                                session_duration_seconds=message.get("session_duration_seconds", 0.0))
+    if "error" in message:
+        return ErrorEvent(message=str(message["error"]))
+    return None
+
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """One aiohttp session per process; limit=0 so open streams are never capped by the connector."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+    return _http_session
+
+
+class AsyncStreamingClient:
+    """A single STT session.
+
+    `stream()` never blocks: audio goes into a bounded queue drained by a sender task.
+    When the queue is full the oldest frame is dropped (and counted), so a slow
+    upstream can never stall the caller's receive loop. Unexpected disconnects are
+    retried with exponential backoff while queued audio is kept; the attempt budget
+    covers one outage, not the whole (possibly pooled, long-lived) session.
+    """
+
+    def __init__(self, api_key: str, sample_rate: int = 16000, format_turns: bool = True,
+                 extra_params: Optional[Dict] = None, url: str = ASSEMBLYAI_STREAM_URL,
+                 max_queued_frames: int = 100, max_reconnects: int = 3):
+        self.api_key = api_key
+        self.url = url
+        self.params = {"sample_rate": sample_rate, "format_turns": str(format_turns).lower(), **(extra_params or {})}
+        self.max_reconnects = max_reconnects
+        self.session_id = None
+        self.dropped_frames = 0
+        self.reconnects = 0
+        self.opened_at = 0.0  # monotonic() of the last successful (re)connect.
+        self._handlers: Dict[str, List[Callable]] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued_frames)
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._connected = asyncio.Event()
+        self._closing = False
+        self._failure: Optional[str] = None  # Why the stream ended for good; set once, wakes all waiters.
+        self._sender_task = None
+        self._receiver_task = None
+
+    def on(self, event_type: str, handler: Callable):
+        """Registers a handler (plain function or coroutine function) for an event type."""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    async def _emit(self, event_type: str, event):
+        for handler in self._handlers.get(event_type, []):
+            try:
+                result = handler(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logging.error(f"STT {event_type} handler failed: {e}", exc_info=True)
+
+    async def _open(self):
+        self._ws = await get_http_session().ws_connect(
+            self.url, headers={"Authorization": self.api_key}, params=self.params, heartbeat=20
+        )
+        self.opened_at = time.monotonic()
+        self._connected.set()
+
+    def _fail(self, reason: str):
+        self._failure = reason
+        self._connected.set()  # Release send()/force_endpoint() callers so they raise instead of waiting forever.
+
+    def _check_open(self):
+        if self._failure:
+            raise SttStreamClosed(self._failure)
+
+    async def connect(self):
+        """Opens the upstream stream; raises if the first connection attempt fails."""
+        await self._open()
+        self._sender_task = asyncio.create_task(self._send_loop())
+        self._receiver_task = asyncio.create_task(self._receive_loop())
+
+    def stream(self, audio: bytes) -> bool:
+        """Queues one audio frame for upload. Returns False if an older frame had to be dropped.
+
+        Raises SttStreamClosed once the stream has ended for good.
+        """
+        self._check_open()
+        if self._closing:
+            return False
+        dropped = False
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped_frames += 1
+            dropped = True
+        self._queue.put_nowait(audio)
+        return not dropped
+
+    async def send(self, audio: bytes):
+        """Sends one frame right away, waiting out any reconnect in progress.
+
+        Unlike stream(), this is where a slow upstream pushes back on the caller,
+        so it belongs in a dedicated sender task rather than a receive loop.
+        Raises SttStreamClosed once the stream has ended for good.
+        """
+        if self._closing:
+            return
+        await self._connected.wait()
+        self._check_open()
+        try:
+            await self._ws.send_bytes(audio)
+        except (ConnectionResetError, aiohttp.ClientError, RuntimeError) as e:
+            logging.warning(f"STT send failed, waiting for reconnect: {e}")
+
+    async def force_endpoint(self):
+        """Asks the server to end the current turn now. Use from the same task as send()."""
+        if self._closing:
+            return
+        await self._connected.wait()
+        self._check_open()
+        try:
+            await self._ws.send_str(json.dumps({"type": "ForceEndpoint"}))
+        except (ConnectionResetError, aiohttp.ClientError, RuntimeError) as e:
+            logging.warning(f"STT ForceEndpoint failed: {e}")
+
+    @property
+    def queued_frames(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def is_open(self) -> bool:
+        return not self._closing and self._failure is None and self._ws is not None and not self._ws.closed
+
+    async def _send_loop(self):
+        while True:
+            audio = await self._queue.get()
+            await self._connected.wait()
+            if self._failure:
+                return
+            try:
+                await self._ws.send_bytes(audio)
+            except (ConnectionResetError, aiohttp.ClientError, RuntimeError) as e:
+                logging.warning(f"STT send failed, waiting for reconnect: {e}")
+
+    async def _receive_loop(self):
+        while not self._closing:
+            async for msg in self._ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                event = parse_event(json.loads(msg.data))
+                if isinstance(event, BeginEvent):
+                    self.session_id = event.session_id
+                    await self._emit(StreamingEvents.Begin, event)
+                elif isinstance(event, TurnEvent):
+                    await self._emit(StreamingEvents.Turn, event)
+                elif isinstance(event, TerminationEvent):
+                    await self._emit(StreamingEvents.Termination, event)
+                elif isinstance(event, ErrorEvent):
+                    await self._emit(StreamingEvents.Error, event)
+
+            self._connected.clear()
+            code = self._ws.close_code
+            if self._closing:
+                return
+            if time.monotonic() - self.opened_at >= STABLE_STREAM_S:
+                self.reconnects = 0
+            if code in FATAL_CLOSE_CODES or self.reconnects >= self.max_reconnects:
+                self._fail(f"STT stream closed (code {code}).")
+                await self._emit(StreamingEvents.Error, ErrorEvent(message=self._failure, code=code, fatal=True))
+                return
+            if not await self._reconnect(code):
+                self._fail(f"STT stream could not be reopened after {self.reconnects} attempts.")
+                return
+
+    async def _reconnect(self, code) -> bool:
+        """Reopens the stream with exponential backoff; False once the attempts are used up."""
+        while self.reconnects < self.max_reconnects:
+            delay = 0.25 * (2 ** self.reconnects)
+            self.reconnects += 1
+            logging.warning(f"STT stream dropped (code {code}); reconnecting in {delay:.2f}s (attempt {self.reconnects}).")
+            await asyncio.sleep(delay)
+            try:
+                await self._open()
+                return True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.error(f"STT reconnect failed: {e}")
+                await self._emit(StreamingEvents.Error, ErrorEvent(message=str(e), fatal=self.reconnects >= self.max_reconnects))
+        return False
+
+    async def disconnect(self, terminate: bool = True):
+        """Ends the session, asking the server to finalize it first when still connected."""
+        self._closing = True
+        if self._sender_task:
+            self._sender_task.cancel()
+        if self._ws is not None and not self._ws.closed:
+            try:
+                if terminate and self._receiver_task:
+                    await self._ws.send_str(json.dumps({"type": "Terminate"}))
+                    # Give the server a moment to flush the final turn and its Termination message.
+                    await asyncio.wait_for(asyncio.shield(self._receiver_task), timeout=1.0)
+            except (asyncio.TimeoutError, ConnectionResetError, aiohttp.ClientError, RuntimeError):
+                pass
+            await self._ws.close()
+        if self._receiver_task:
+            self._receiver_task.cancel()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from stt_client import AsyncStreamingClient
+
+# --- Pre-connected STT Session Pool ---
+# Keeps a few streaming sessions for the server's own AssemblyAI key already
+# authenticated and connected, so /ws can hand one to a new client instead of
+# paying the handshake before the first word. Idle sessions are recycled before the
+# upstream would time them out. Only sessions that use the server key and the
+# deployment's stream parameters can be served from the pool.
+POOL_CHECK_INTERVAL_S = 5.0
+
+
+class SttSessionPool:
+    def __init__(self, api_key: str, size: int, max_idle_s: float, **client_kwargs):
+        self.api_key = api_key
+        self.size = size
+        self.max_idle_s = max_idle_s
+        self.client_kwargs = client_kwargs
+        self._idle: List[AsyncStreamingClient] = []
+        self._refill_task: Optional[asyncio.Task] = None
+        self._recycle_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def serves(self, api_key: str, **client_kwargs) -> bool:
+        return api_key == self.api_key and client_kwargs == self.client_kwargs
+
+    async def start(self):
+        self._schedule_refill()
+        self._recycle_task = asyncio.create_task(self._recycle_loop())
+
+    def acquire(self) -> Optional[AsyncStreamingClient]:
+        """Hands out a ready session, or None if none is ready (the caller then connects its own)."""
+        now = time.monotonic()
+        while self._idle:
+            client = self._idle.pop()
+            if client.is_open and now - client.opened_at < self.max_idle_s:
+                self.hits += 1
+                self._schedule_refill()
+                return client
+            asyncio.create_task(client.disconnect())
+        self.misses += 1
+        self._schedule_refill()
+        return None
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while len(self._idle) < self.size:
+            client = AsyncStreamingClient(api_key=self.api_key, **self.client_kwargs)
+            try:
+                await client.connect()
+            except Exception as e:
+                logging.warning(f"STT pool could not pre-connect a session: {e}")
+                return
+            self._idle.append(client)
+
+    async def _recycle_loop(self):
+        while True:
+            await asyncio.sleep(POOL_CHECK_INTERVAL_S)
+            # Retire sessions one check interval before they would hit the idle limit.
+            cutoff = time.monotonic() - (self.max_idle_s - POOL_CHECK_INTERVAL_S)
+            stale = [client for client in self._idle if client.opened_at < cutoff or not client.is_open]
+            if stale:
+                self._idle = [client for client in self._idle if client not in stale]
+                await asyncio.gather(*(client.disconnect() for client in stale), return_exceptions=True)
+            self._schedule_refill()
+
+    async def close(self):
+        for task in (self._refill_task, self._recycle_task):
+            if task:
+                task.cancel()
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(client.disconnect() for client in idle), return_exceptions=True)
+        logging.info(f"STT pool closed ({self.hits} hits, {self.misses} misses).")
@@ -0,0 +1,87 @@
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import config
+
+# --- End-of-Turn Finalization Policy ---
+# Decides which STT end-of-turn event starts the LLM, and which turn-detection
+# thresholds are sent to AssemblyAI. Deployment defaults come from config.py and a
+# session may override them in its config message ("turn_policy").
+#   formatted    wait for the formatted end-of-turn transcript (original behaviour)
+#   early        answer the unformatted end-of-turn transcript right away and swap
+#                the formatted text into the chat display when it arrives
+#   unformatted  never ask STT to format turns at all
+TURN_MODES = ("formatted", "early", "unformatted")
+DEFAULT_VAD_HANGOVER_MS = 1500
+STT_DEFAULT_MAX_TURN_SILENCE_MS = 2400  # AssemblyAI's max_turn_silence when the stream does not set one.
+
+
+@dataclass(frozen=True)
+class TurnPolicy:
+    mode: str = "formatted"
+    end_of_turn_confidence_threshold: Optional[float] = None
+    min_end_of_turn_silence_when_confident: Optional[int] = None  # ms
+    max_turn_silence: Optional[int] = None  # ms
+
+    @property
+    def format_turns(self) -> bool:
+        return self.mode != "unformatted"
+
+    @property
+    def vad_hangover_ms(self) -> int:
+        # The VAD gate force-ends a turn when its hang-over expires, so it must not be
+        # shorter than the silence STT itself is allowed to wait for.
+        max_turn_silence = STT_DEFAULT_MAX_TURN_SILENCE_MS if self.max_turn_silence is None else self.max_turn_silence
+        return max(DEFAULT_VAD_HANGOVER_MS, max_turn_silence)
+
+    def stream_params(self) -> dict:
+        """Extra query parameters for the STT stream; unset thresholds keep AssemblyAI's defaults."""
+        params = {
+            "end_of_turn_confidence_threshold": self.end_of_turn_confidence_threshold,
+            "min_end_of_turn_silence_when_confident": self.min_end_of_turn_silence_when_confident,
+            "max_turn_silence": self.max_turn_silence,
+        }
+        return {key: value for key, value in params.items() if value is not None}
+
+    def should_respond(self, end_of_turn: bool, turn_is_formatted: bool) -> bool:
+        """True for the single end-of-turn event of a turn that should start the LLM."""
+        if not end_of_turn:
+            return False
+        if self.mode == "formatted":
+            return turn_is_formatted
+        return True
+
+
+def _parse(value, cast, low, high):
+    if value in (None, ""):
+        return None
+    try:
+        parsed = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid turn policy value: {value!r}")
+    if not low <= parsed <= high:
+        raise ValueError(f"Turn policy value {parsed} is outside {low}-{high}.")
+    return parsed
+
+
+def build_turn_policy(base: TurnPolicy, overrides: Optional[dict]) -> TurnPolicy:
+    """Applies a partial set of overrides (from env or a session) on top of a policy."""
+    if not overrides:
+        return base
+    mode = overrides.get("mode") or base.mode
+    if mode not in TURN_MODES:
+        raise ValueError(f"Unknown turn policy mode: {mode}")
+    fields = {
+        "end_of_turn_confidence_threshold": _parse(overrides.get("end_of_turn_confidence_threshold"), float, 0.0, 1.0),
+        "min_end_of_turn_silence_when_confident": _parse(overrides.get("min_end_of_turn_silence_when_confident"), int, 0, 10000),
+        "max_turn_silence": _parse(overrides.get("max_turn_silence"), int, 0, 10000),
+    }
+    return replace(base, mode=mode, **{key: value for key, value in fields.items() if value is not None})
+
+
+DEPLOYMENT_TURN_POLICY = build_turn_policy(TurnPolicy(), {
+    "mode": config.TURN_POLICY_MODE,
+    "end_of_turn_confidence_threshold": config.END_OF_TURN_CONFIDENCE_THRESHOLD,
+    "min_end_of_turn_silence_when_confident": config.MIN_END_OF_TURN_SILENCE_WHEN_CONFIDENT,
+    "max_turn_silence": config.MAX_TURN_SILENCE,
+})
@@ -0,0 +1,83 @@
+import json
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+# --- Compact Conversation Turns ---
+# Chat history is kept as small slotted records rather than SDK Content objects or
+# nested dicts. A turn is plain text, a tool call (model) or a tool result (user).
+# The Gemini wire format is built when a reply needs it and not kept, so stored
+# sessions hold only the slotted records (the SDK copies the dicts into its own
+# protos anyway). Roles are interned so thousands of stored turns share two strings.
+USER = sys.intern("user")
+MODEL = sys.intern("model")
+_ROLES = {"user": USER, "model": MODEL}
+
+
+class Turn:
+    __slots__ = ("role", "text", "tool_name", "tool_args", "tool_result", "persisted", "_nbytes")
+
+    def __init__(self, role: str, text: str = "", tool_name: Optional[str] = None,
+                 tool_args: Optional[Dict[str, Any]] = None, tool_result: Any = None):
+        self.role = _ROLES.get(role) or sys.intern(role)
+        self.text = text
+        self.tool_name = tool_name
+        self.tool_args = tool_args
+        self.tool_result = tool_result
+        self.persisted = False  # Set once the session journal has the turn.
+        self._nbytes = None
+
+    @classmethod
+    def user(cls, text: str) -> "Turn":
+        return cls(USER, text)
+
+    @classmethod
+    def model(cls, text: str) -> "Turn":
+        return cls(MODEL, text)
+
+    @classmethod
+    def tool_call(cls, name: str, args: Dict[str, Any]) -> "Turn":
+        return cls(MODEL, tool_name=name, tool_args=args)
+
+    @classmethod
+    def tool_response(cls, name: str, result: Any) -> "Turn":
+        return cls(USER, tool_name=name, tool_result=result)
+
+    @property
+    def is_tool_call(self) -> bool:
+        return self.tool_name is not None and self.role is MODEL
+
+    @property
+    def is_tool_response(self) -> bool:
+        return self.tool_name is not None and self.role is USER
+
+    def to_wire(self) -> dict:
+        """The Gemini Content dict for this turn."""
+        if self.is_tool_call:
+            part = {"function_call": {"name": self.tool_name, "args": self.tool_args or {}}}
+        elif self.is_tool_response:
+            part = {"function_response": {"name": self.tool_name, "response": {"result": self.tool_result}}}
+        else:
+            part = self.text
+        return {"role": self.role, "parts": [part]}
+
+    def to_record(self) -> list:
+        """Compact JSON form for spilling to disk: [role, text, tool_name, tool_args, tool_result]."""
+        record = [self.role, self.text, self.tool_name, self.tool_args, self.tool_result]
+        while record[-1] is None:
+            record.pop()
+        return record
+
+    @classmethod
+    def from_record(cls, record: list) -> "Turn":
+        return cls(*record)
+
+    @property
+    def nbytes(self) -> int:
+        """Serialized size of the turn, measured once; used for the session byte limits."""
+        if self._nbytes is None:
+            self._nbytes = len(json.dumps(self.to_record(), ensure_ascii=False, default=str).encode("utf-8"))
+        return self._nbytes
+
+
+def to_wire_history(turns: Iterable[Turn]) -> List[dict]:
+    return [turn.to_wire() for turn in turns]
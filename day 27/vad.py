@@ -0,0 +1,128 @@
+import collections
+from typing import List, NamedTuple
+
+import numpy as np
+
+# --- Server-side Voice Activity Gate ---
+# Sits between the browser and STT so silence is never streamed upstream. Each
+# chunk is split into 10 ms sub-frames and scored with vectorized energy and
+# zero-crossing measures against a noise floor found by minimum statistics: the
+# quietest chunk level heard in the last FLOOR_WINDOW_MS. That floor drops at once
+# when the room gets quieter and follows a louder room (a fan switching on) within
+# one window even while the gate is open, so a noise step cannot hold the gate open
+# forever. Until the first window has filled, the floor is capped at a typical room
+# level so a loud first chunk cannot hide quieter speech. A pre-roll buffer keeps
+# word onsets from being clipped, a hang-over keeps trailing syllables and lets
+# STT see the end-of-turn silence, and a periodic silent keep-alive frame stops
+# the upstream session from idling out.
+SUBFRAME_MS = 10
+VOICED_MARGIN_DB = 10.0     # Energy above the noise floor that counts as voiced speech.
+UNVOICED_MARGIN_DB = 5.0    # Weaker energy still counts when the zero-crossing rate says fricative.
+UNVOICED_MIN_ZCR = 0.25
+MIN_NOISE_FLOOR_DB = 25.0   # Keeps digital silence from making every breath "speech".
+FLOOR_WINDOW_MS = 2000      # Long enough to always contain a pause between words.
+WARMUP_FLOOR_CAP_DB = 45.0  # Roughly a quiet room; the floor never starts above it.
+CHUNK_LEVEL_PERCENTILE = 10  # A chunk's noise level: its quieter sub-frames, not one outlier.
+
+
+class GateResult(NamedTuple):
+    frames: List[bytes]
+    speech_started: bool
+    speech_ended: bool
+
+
+class VoiceActivityGate:
+    """Forwards speech (plus pre-roll, hang-over and keep-alives) and drops the rest."""
+
+    def __init__(self, sample_rate: int = 16000, pre_roll_ms: int = 300, hangover_ms: int = 1500, keepalive_ms: int = 5000):
+        self.subframe_samples = sample_rate * SUBFRAME_MS // 1000
+        self.bytes_per_ms = sample_rate * 2 // 1000
+        self.pre_roll_bytes = pre_roll_ms * self.bytes_per_ms
+        self.hangover_ms = hangover_ms
+        self.keepalive_ms = keepalive_ms
+        self.noise_floor_db = None
+        self._levels = collections.deque()  # (chunk_ms, level_db) over the last FLOOR_WINDOW_MS
+        self._levels_ms = 0.0
+        self._heard_ms = 0.0
+        self.in_speech = False
+        self.silence_ms = 0.0
+        self.since_forward_ms = 0.0
+        self.pre_roll = collections.deque()
+        self.pre_roll_size = 0
+        self.received_bytes = 0
+        self.forwarded_bytes = 0
+
+    def _track_floor(self, level_db: float, chunk_ms: float) -> float:
+        self._levels.append((chunk_ms, level_db))
+        self._levels_ms += chunk_ms
+        self._heard_ms += chunk_ms
+        while self._levels_ms - self._levels[0][0] >= FLOOR_WINDOW_MS:
+            self._levels_ms -= self._levels.popleft()[0]
+        floor = min(level for _, level in self._levels)
+        if self._heard_ms < FLOOR_WINDOW_MS:
+            floor = min(floor, WARMUP_FLOOR_CAP_DB)
+        self.noise_floor_db = max(MIN_NOISE_FLOOR_DB, floor)
+        return self.noise_floor_db
+
+    def _score(self, samples: np.ndarray, chunk_ms: float) -> bool:
+        usable = samples.size - samples.size % self.subframe_samples
+        frames = samples[:usable].reshape(-1, self.subframe_samples) if usable else samples.reshape(1, -1)
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+
+        floor = self._track_floor(float(np.percentile(energy_db, CHUNK_LEVEL_PERCENTILE)), chunk_ms)
+        voiced = energy_db > floor + VOICED_MARGIN_DB
+        unvoiced = (energy_db > floor + UNVOICED_MARGIN_DB) & (zcr > UNVOICED_MIN_ZCR)
+        return bool(np.any(voiced | unvoiced))
+
+    def _forward(self, frames: List[bytes]) -> List[bytes]:
+        self.forwarded_bytes += sum(len(frame) for frame in frames)
+        self.since_forward_ms = 0.0
+        return frames
+
+    def process(self, chunk: bytes) -> GateResult:
+        """Scores one PCM16 chunk and returns the frames to send upstream."""
+        self.received_bytes += len(chunk)
+        chunk_ms = len(chunk) / self.bytes_per_ms
+        samples = np.frombuffer(chunk[:len(chunk) - len(chunk) % 2], dtype="<i2").astype(np.float32)
+        if not samples.size:
+            return GateResult([], False, False)
+
+        if self._score(samples, chunk_ms):
+            self.silence_ms = 0.0
+            if not self.in_speech:
+                self.in_speech = True
+                frames = list(self.pre_roll) + [chunk]
+                self.pre_roll.clear()
+                self.pre_roll_size = 0
+                return GateResult(self._forward(frames), True, False)
+            return GateResult(self._forward([chunk]), False, False)
+
+        if self.in_speech:
+            self.silence_ms += chunk_ms
+            if self.silence_ms <= self.hangover_ms:
+                return GateResult(self._forward([chunk]), False, False)
+            self.in_speech = False
+            return GateResult([], False, True)
+
+        self.pre_roll.append(bytes(chunk))  # Copied: the caller may reuse its buffer.
+        self.pre_roll_size += len(chunk)
+        while self.pre_roll_size - len(self.pre_roll[0]) >= self.pre_roll_bytes:
+            self.pre_roll_size -= len(self.pre_roll.popleft())
+
+        self.since_forward_ms += chunk_ms
+        if self.since_forward_ms >= self.keepalive_ms:
+            return GateResult(self._forward([bytes(len(chunk))]), False, False)
+        return GateResult([], False, False)
+
+    @property
+    def forward_ratio(self) -> float:
+        return self.forwarded_bytes / self.received_bytes if self.received_bytes else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "received_seconds": round(self.received_bytes / self.bytes_per_ms / 1000, 2),
+            "forwarded_seconds": round(self.forwarded_bytes / self.bytes_per_ms / 1000, 2),
+            "forward_ratio": round(self.forward_ratio, 3),
+            "noise_floor_db": round(self.noise_floor_db or 0.0, 1),
+        }